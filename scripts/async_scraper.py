@@ -0,0 +1,190 @@
+import argparse
+import asyncio
+import json
+import os
+from collections import namedtuple
+
+import typhoon_scraper as ty
+
+DEFAULT_CONCURRENCY = 8
+
+# One parsed storm. `typhoon` is None when the storm page could not be scraped.
+StormResult = namedtuple("StormResult", ["year", "basin_name", "index", "total", "link", "typhoon"])
+
+
+async def scrape_many(years, basins, concurrency=DEFAULT_CONCURRENCY, fetcher=None, skip=None, skip_links=(), folder_path="data"):
+    """
+    Scrape every storm for the given years and basins, yielding each one as soon as it is parsed.
+
+    Args:
+        years (iterable): Years to scrape.
+        basins (iterable): Full basin names, as used in BASIN_ABBREVIATIONS.
+        concurrency (int): Maximum number of pages being fetched or parsed at once.
+        fetcher (PageFetcher): Fetcher to use. Defaults to the scraper's shared fetcher.
+        skip (callable): Optional skip(year, basin_name) predicate for basin-years that need no scraping.
+        skip_links (iterable): Storm links that were already scraped and should not be fetched again.
+        folder_path (str): Cache folder holding the shared year link index.
+
+    Yields:
+        StormResult: One result per storm, in completion order.
+    """
+    fetcher = fetcher or ty.get_fetcher()
+    basins = [basin_name.strip() for basin_name in basins]
+    skip_links = set(skip_links)
+    semaphore = asyncio.Semaphore(concurrency)
+    results = asyncio.Queue()
+
+    async def run_blocking(func, *args):
+        async with semaphore:
+            return await asyncio.to_thread(func, *args)
+
+    async def scrape_storm(year, basin_name, index, total, link):
+        url = ty.storm_url(link)
+        html = await run_blocking(fetcher.fetch_text, url)
+        typhoon = await run_blocking(ty.build_storm_from_page, url, html)
+        await results.put(StormResult(year, basin_name, index, total, link, typhoon))
+
+    async def scrape_year(year):
+        pending_basins = [basin_name for basin_name in basins if not (skip and skip(year, basin_name))]
+        if not pending_basins:
+            return
+
+        # The year page lists every basin, so its links are looked up once and shared by all of them
+        links_by_basin = await run_blocking(ty.scrape_typhoon_links, year, fetcher, folder_path)
+        if not links_by_basin:
+            print(f"No data available for {year}.")
+            return
+
+        storms = []
+        for basin_name in pending_basins:
+            if basin_name not in links_by_basin:
+                print(f"Basin '{basin_name}' not found for {year}.")
+                continue
+            links = links_by_basin[basin_name]
+            for index, link in enumerate(links):
+                if link not in skip_links:
+                    storms.append(scrape_storm(year, basin_name, index, len(links), link))
+        await asyncio.gather(*storms)
+
+    producer = asyncio.ensure_future(asyncio.gather(*(scrape_year(year) for year in years)))
+    producer.add_done_callback(lambda _: results.put_nowait(None))
+    try:
+        while True:
+            result = await results.get()
+            if result is None:
+                break
+            yield result
+        producer.result()
+    finally:
+        producer.cancel()
+
+
+######################
+# Resumable backfill #
+######################
+
+def load_progress(progress_file):
+    """Load the storms already scraped for an unfinished basin-year."""
+    records = {}
+    if not os.path.exists(progress_file):
+        return records
+
+    truncated = False
+    with open(progress_file, "r") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # The last line may be cut short if the previous run was interrupted mid-write
+                truncated = True
+                continue
+            # Older progress files recorded the full URL of each storm
+            record["link"] = ty.relative_link(record["link"])
+            records[record["link"]] = record
+
+    if truncated:
+        # Rewrite the file so new records are not appended onto the broken line
+        with open(progress_file, "w") as file:
+            for record in records.values():
+                file.write(json.dumps(record) + "\n")
+    return records
+
+
+def finish_basin_year(year, basin_name, records, folder_path):
+    """Write the completed basin-year cache in the original storm order and drop its progress file."""
+    ordered = sorted(records.values(), key=lambda record: record["index"])
+    ty.save_cache([record["typhoon"] for record in ordered], year, basin_name, folder_path)
+    os.remove(ty.get_cache_path(year, basin_name, folder_path, "data.partial.jsonl"))
+
+
+async def backfill(years, basins, folder_path="data", concurrency=DEFAULT_CONCURRENCY):
+    """Scrape a range of basin-years into the cache folder, resuming from any earlier interrupted run."""
+    os.makedirs(folder_path, exist_ok=True)
+
+    def is_cached(year, basin_name):
+        return ty.cache_exists(year, basin_name, folder_path)
+
+    # Pick up storms that an interrupted run already scraped
+    progress = {}
+    for year in years:
+        for basin_name in basins:
+            if not is_cached(year, basin_name):
+                records = load_progress(ty.get_cache_path(year, basin_name, folder_path, "data.partial.jsonl"))
+                if records:
+                    progress[(year, basin_name)] = records
+    skip_links = {link for records in progress.values() for link in records}
+
+    failed = {}
+    async for result in scrape_many(years, basins, concurrency, skip=is_cached, skip_links=skip_links, folder_path=folder_path):
+        key = (result.year, result.basin_name)
+        records = progress.setdefault(key, {})
+        progress_file = ty.get_cache_path(result.year, result.basin_name, folder_path, "data.partial.jsonl")
+
+        if result.typhoon is None:
+            failed[key] = failed.get(key, 0) + 1
+        else:
+            record = {"link": result.link, "index": result.index, "total": result.total, "typhoon": result.typhoon}
+            records[result.link] = record
+            with open(progress_file, "a") as file:
+                file.write(json.dumps(record) + "\n")
+
+        done = len(records) + failed.get(key, 0)
+        name = result.typhoon["name"] if result.typhoon else "FAILED"
+        print(f"[{result.basin_name} {result.year}] {done}/{result.total} {name}")
+
+        # Failed storms count as done for the tally, but the cache is only written once every storm was
+        # scraped. Otherwise the progress file is kept and the next run only retries the failed ones.
+        if done == result.total and len(records) == result.total:
+            finish_basin_year(result.year, result.basin_name, records, folder_path)
+            del progress[key]
+
+    # Basin-years whose storms were all scraped by an earlier run never produce a result above
+    for (year, basin_name), records in progress.items():
+        if records and len(records) == next(iter(records.values()))["total"]:
+            finish_basin_year(year, basin_name, records, folder_path)
+        else:
+            failed_count = failed.get((year, basin_name), 0)
+            reason = f" ({failed_count} storms failed)" if failed_count else ""
+            print(f"{basin_name} {year} is incomplete{reason}. Run the backfill again to resume it.")
+
+
+def main():
+    basin_names = {abbr: name for name, abbr in ty.BASIN_ABBREVIATIONS.items()}
+
+    parser = argparse.ArgumentParser(description="Backfill the typhoon data cache for a range of years.")
+    parser.add_argument("start_year", type=int, help="First year to scrape.")
+    parser.add_argument("end_year", type=int, help="Last year to scrape (inclusive).")
+    parser.add_argument("--basins", nargs="+", choices=sorted(basin_names), default=sorted(basin_names),
+                        help="Basin abbreviations to scrape. Defaults to every basin.")
+    parser.add_argument("--folder", default="data", help="Cache folder to write to.")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Maximum number of pages fetched at once.")
+    args = parser.parse_args()
+
+    years = range(args.start_year, args.end_year + 1)
+    basins = [basin_names[abbr] for abbr in args.basins]
+    asyncio.run(backfill(years, basins, args.folder, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
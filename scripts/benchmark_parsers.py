@@ -0,0 +1,98 @@
+import argparse
+import glob
+import os
+import sys
+import time
+
+import page_parsers
+import typhoon_scraper as ty
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "samples", "ibtracs")
+
+
+def record_corpus(corpus_path, year, basin_name):
+    """
+    Download a year page and every storm page of one basin into the corpus folder, named the way
+    check_page_fetcher.py serves them: year_{year}.html and storm_{name}.html.
+    """
+    os.makedirs(corpus_path, exist_ok=True)
+    fetcher = ty.get_fetcher()
+
+    year_html = fetcher.fetch_text(f"{ty.BASE_URL}?name=YearBasin-{year}")
+    if year_html is None:
+        return
+    with open(os.path.join(corpus_path, f"year_{year}.html"), "w", encoding="utf-8") as file:
+        file.write(year_html)
+
+    links = (page_parsers.parse_year_page(year_html) or {}).get(basin_name, [])
+
+    def save_page(url, html):
+        if html is not None:
+            name = url.split("name=", 1)[-1]
+            with open(os.path.join(corpus_path, f"storm_{name}.html"), "w", encoding="utf-8") as file:
+                file.write(html)
+
+    fetcher.map(save_page, [ty.storm_url(link) for link in links])
+    print(f"Recorded {len(links) + 1} pages to {corpus_path}")
+
+
+def load_corpus(corpus_path):
+    """Load the recorded pages as (kind, path, html) tuples. Year pages are named year_*.html."""
+    pages = []
+    for path in sorted(glob.glob(os.path.join(corpus_path, "*.html"))):
+        with open(path, "r", encoding="utf-8") as file:
+            html = file.read()
+        kind = "year" if os.path.basename(path).startswith("year_") else "storm"
+        pages.append((kind, path, html))
+    return pages
+
+
+def parse_page(parser, kind, html):
+    if kind == "year":
+        return parser.parse_year_page(html)
+    return parser.parse_storm_page(html)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the output and speed of the page parser backends.")
+    parser.add_argument("corpus", nargs="?", default=DEFAULT_CORPUS,
+                        help="Folder of recorded IBTrACS pages. Defaults to the pages in samples/ibtracs.")
+    parser.add_argument("--record", nargs=2, metavar=("YEAR", "BASIN"),
+                        help="Record a year page and its storm pages for a basin abbreviation (e.g. 2015 wp) first.")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of passes over the corpus per backend.")
+    args = parser.parse_args()
+
+    if args.record:
+        basin_names = {abbr: name for name, abbr in ty.BASIN_ABBREVIATIONS.items()}
+        record_corpus(args.corpus, int(args.record[0]), basin_names[args.record[1]])
+
+    pages = load_corpus(args.corpus)
+    if not pages:
+        print(f"No recorded pages found in {args.corpus}")
+        return 1
+
+    reference = page_parsers.PARSERS[page_parsers.BeautifulSoupParser.name]
+    expected = [parse_page(reference, kind, html) for kind, path, html in pages]
+
+    mismatches = 0
+    for name, backend in page_parsers.PARSERS.items():
+        for (kind, path, html), result in zip(pages, expected):
+            if parse_page(backend, kind, html) != result:
+                print(f"{name}: output differs from BeautifulSoup for {path}")
+                mismatches += 1
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for kind, path, html in pages:
+                parse_page(backend, kind, html)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>8}: {len(pages) * args.repeat / elapsed:8.1f} pages/s")
+
+    if mismatches:
+        return 1
+    print(f"Every backend matches BeautifulSoup on {len(pages)} pages")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SCRIPTS_PATH = os.path.dirname(os.path.abspath(__file__))
+IMPORT_SNIPPET = "import time; start = time.perf_counter(); import stormchaser; print(time.perf_counter() - start)"
+
+
+def startup_environment(display):
+    """Environment that makes the app quit once the first menu frame is on screen."""
+    env = dict(os.environ, STORMCHASER_EXIT_AFTER_FIRST_FRAME="1", PYGAME_HIDE_SUPPORT_PROMPT="1")
+    if not display:
+        env["SDL_VIDEODRIVER"] = "dummy"
+    return env
+
+
+def time_first_frame(command, env):
+    """Seconds from launching the app until it exits after its first frame, interpreter or bundle startup included."""
+    start = time.perf_counter()
+    subprocess.run(command, cwd=SCRIPTS_PATH, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def time_import(env):
+    """Seconds spent importing stormchaser in a fresh interpreter."""
+    result = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=SCRIPTS_PATH, env=env,
+                            check=True, capture_output=True, text=True)
+    return float(result.stdout.split()[-1])
+
+
+def measure(label, run, repeat):
+    """Run a measurement `repeat` times. Returns the median in milliseconds."""
+    samples = [run() * 1000 for _ in range(repeat)]
+    median = statistics.median(samples)
+    print(f"{label:<22}{median:10.1f} ms median{min(samples):10.1f} ms min")
+    return median
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how long Stormchaser takes to import and to show its first frame.")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of runs per measurement.")
+    parser.add_argument("--bundle", help="Path to a PyInstaller build of stormchaser to measure as well.")
+    parser.add_argument("--display", action="store_true", help="Open a real window instead of using SDL's dummy video driver.")
+    parser.add_argument("--json", help="Write the medians in milliseconds to this file, for CI to track.")
+    parser.add_argument("--budget", type=float, help="Fail if the source run takes longer than this many ms to its first frame.")
+    args = parser.parse_args()
+
+    env = startup_environment(args.display)
+    # The first run builds any missing caches, which later runs and users after the first start do not pay for
+    time_first_frame([sys.executable, "stormchaser.py"], env)
+
+    results = {
+        "source_import_ms": measure("Import", lambda: time_import(env), args.repeat),
+        "source_first_frame_ms": measure(
+            "First frame (source)", lambda: time_first_frame([sys.executable, "stormchaser.py"], env), args.repeat
+        ),
+    }
+    if args.bundle:
+        bundle = os.path.abspath(args.bundle)
+        time_first_frame([bundle], env)
+        results["bundle_first_frame_ms"] = measure("First frame (bundle)", lambda: time_first_frame([bundle], env), args.repeat)
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.budget is not None and results["source_first_frame_ms"] > args.budget:
+        print(f"First frame took {results['source_first_frame_ms']:.1f} ms, over the budget of {args.budget:.1f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
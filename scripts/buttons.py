@@ -1,4 +1,5 @@
 import pygame
+from text_cache import render_text
 
 # Base Button Class
 class Button:
@@ -10,11 +11,12 @@ class Button:
         self.text_color = text_color
 
     def draw(self, screen):
-        """Draw the button on the screen."""
+        """Draw the button on the screen. Returns the rect drawn."""
         pygame.draw.rect(screen, self.color, self.rect)
-        text_surface = self.font.render(self.text, True, self.text_color)
+        text_surface = render_text(self.font, self.text, self.text_color)
         screen.blit(text_surface, (self.rect.centerx - text_surface.get_width() // 2, 
                                    self.rect.centery - text_surface.get_height() // 2))
+        return self.rect
 
     def is_clicked(self, mouse_pos):
         """Check if the button is clicked."""
@@ -35,6 +37,41 @@ class ToggleableButton(Button):
     def draw(self, screen):
         """Override draw method to include play/pause logic."""
         pygame.draw.rect(screen, self.color, self.rect)
-        text_surface = self.font.render(self.text, True, self.text_color)
+        text_surface = render_text(self.font, self.text, self.text_color)
         screen.blit(text_surface, (self.rect.centerx - text_surface.get_width() // 2, 
-                                   self.rect.centery - text_surface.get_height() // 2))
\ No newline at end of file
+                                   self.rect.centery - text_surface.get_height() // 2))
+        return self.rect
+
+# Draggable timeline slider
+class TimelineSlider:
+    def __init__(self, x, y, width, height, color, fill_color, handle_color):
+        self.rect = pygame.Rect(x, y, width, height)
+        self.color = color
+        self.fill_color = fill_color
+        self.handle_color = handle_color
+        self.dragging = False
+
+    def draw(self, screen, fraction):
+        """Draw the slider with the handle at the given fraction of the timeline. Returns the rect drawn."""
+        fraction = min(max(fraction, 0), 1)
+        pygame.draw.rect(screen, self.color, self.rect)
+        filled_rect = pygame.Rect(self.rect.x, self.rect.y, int(self.rect.width * fraction), self.rect.height)
+        pygame.draw.rect(screen, self.fill_color, filled_rect)
+        handle_rect = pygame.draw.circle(screen, self.handle_color, (filled_rect.right, self.rect.centery), self.rect.height)
+        return self.rect.union(handle_rect)
+
+    def fraction_at(self, x):
+        return min(max((x - self.rect.x) / self.rect.width, 0), 1)
+
+    def handle_event(self, event):
+        """Track clicks and drags on the slider. Returns the fraction of the timeline to seek to, or None."""
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            # Allow grabbing slightly above and below the thin bar
+            if self.rect.inflate(0, self.rect.height * 2).collidepoint(event.pos):
+                self.dragging = True
+                return self.fraction_at(event.pos[0])
+        elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+            self.dragging = False
+        elif event.type == pygame.MOUSEMOTION and self.dragging:
+            return self.fraction_at(event.pos[0])
+        return None
@@ -0,0 +1,152 @@
+import argparse
+import collections
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+SCRIPTS_PATH = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PAGES = os.path.join(os.path.dirname(SCRIPTS_PATH), "samples", "ibtracs")
+
+
+class RecordedSite:
+    """
+    Local stand-in for the IBTrACS site that serves recorded pages with http.server.
+
+    index.php?name=YearBasin-{year} is served from year_{year}.html and index.php?name={storm}
+    from storm_{storm}.html. Every request is logged with the time it arrived.
+    """
+
+    def __init__(self, pages_path, delays=None):
+        self.pages_path = pages_path
+        self.delays = delays or {}  # Seconds to wait before answering, by page name
+        self.requests = []
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.create_handler())
+        self.server.daemon_threads = True
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/"
+
+    def page_path(self, name):
+        if name.startswith("YearBasin-"):
+            return os.path.join(self.pages_path, f"year_{name[len('YearBasin-'):]}.html")
+        return os.path.join(self.pages_path, f"storm_{name}.html")
+
+    def create_handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                name = parse_qs(urlparse(self.path).query).get("name", [""])[0]
+                with site.lock:
+                    site.requests.append((time.monotonic(), name))
+                time.sleep(site.delays.get(name, 0))
+
+                path = site.page_path(name)
+                if not name or not os.path.exists(path):
+                    self.send_error(404)
+                    return
+                with open(path, "rb") as file:
+                    body = file.read()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def reset(self):
+        with self.lock:
+            self.requests = []
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def check(label, passed, detail=""):
+    print(f"{'PASS' if passed else 'FAIL'}  {label}{f': {detail}' if detail and not passed else ''}")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the page fetcher and scraper against a local copy of recorded IBTrACS pages.")
+    parser.add_argument("--pages", default=DEFAULT_PAGES, help="Folder of recorded pages (year_*.html, storm_*.html).")
+    parser.add_argument("--year", type=int, default=2015, help="Year of the recorded year page.")
+    parser.add_argument("--basin", default="Western Pacific", help="Basin whose storm pages were recorded.")
+    parser.add_argument("--rate", type=float, default=20.0, help="Requests per second allowed to the stand-in.")
+    args = parser.parse_args()
+
+    with RecordedSite(args.pages) as site:
+        # The scraper reads the base URL when it is imported
+        os.environ["IBTRACS_BASE_URL"] = site.base_url
+        sys.path.insert(0, SCRIPTS_PATH)
+        import page_parsers
+        import typhoon_scraper as ty
+        from page_fetcher import PageFetcher
+
+        with open(site.page_path(f"YearBasin-{args.year}"), "r", encoding="utf-8") as file:
+            links = page_parsers.parse_year_page(file.read())[args.basin]
+        names = [link.split("name=", 1)[1] for link in links]
+        urls = [ty.storm_url(link) for link in links]
+        expected = []
+        for name in names:
+            with open(site.page_path(name), "r", encoding="utf-8") as file:
+                expected.append(ty.build_typhoon_data(*page_parsers.parse_storm_page(file.read()))["name"])
+
+        results = []
+
+        # Earlier pages answer slower, so the pages finish in the reverse of the listed order
+        site.delays = {name: 0.05 * (len(names) - index) for index, name in enumerate(names)}
+        with PageFetcher(max_workers=len(urls), rate_limits={}) as fetcher:
+            storms = fetcher.map(ty.build_storm_from_page, urls)
+        site.delays = {}
+        got = [storm["name"] if storm else None for storm in storms]
+        results.append(check("results come back in the listed order", got == expected, f"{got} != {expected}"))
+        results.append(check("storms are tagged with their relative link", [storm and storm["source"] for storm in storms] == links))
+
+        # A whole basin-year scrape, year page included
+        site.reset()
+        with tempfile.TemporaryDirectory() as folder_path, PageFetcher(rate_limits={}) as fetcher:
+            typhoons = ty.save_data_as_json(args.year, args.basin, folder_path, fetcher)
+        counts = collections.Counter(name for _, name in site.requests)
+        results.append(check("every storm of the basin is scraped", [typhoon["name"] for typhoon in typhoons or []] == expected))
+        results.append(check("each storm page is fetched once", all(counts[name] == 1 for name in names), dict(counts)))
+        results.append(check("the year page is fetched once", counts[f"YearBasin-{args.year}"] == 1, dict(counts)))
+        results.append(check("no other pages are fetched", sum(counts.values()) == len(names) + 1, dict(counts)))
+
+        # Requests to a rate-limited host must be spaced out even with a worker per page
+        site.reset()
+        with PageFetcher(max_workers=len(urls), rate_limits={"127.0.0.1": args.rate}) as fetcher:
+            fetcher.map(lambda url, html: html, urls * 2)
+        arrivals = sorted(arrival for arrival, _ in site.requests)
+        # Some slack for when a request is sent after the time the limiter gave it
+        slack = 0.5 / args.rate
+        too_early = [
+            index for index in range(1, len(arrivals))
+            if arrivals[index] - arrivals[0] < index / args.rate - slack
+        ]
+        span = arrivals[-1] - arrivals[0]
+        results.append(check(
+            f"the per-host rate limit of {args.rate:g}/s holds", not too_early,
+            f"{len(arrivals)} requests in {span:.2f} s, requests {too_early} came early"
+        ))
+
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
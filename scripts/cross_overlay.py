@@ -0,0 +1,57 @@
+import pygame
+
+CROSS_COLOR = (255, 0, 0)  # Red
+CROSS_WIDTH = 3
+
+
+def merge_rects(rects):
+    """Merge overlapping rects, so no area is covered by more than one of them."""
+    merged = []
+    for rect in rects:
+        rect = rect.copy()
+        index = rect.collidelist(merged)
+        while index != -1:
+            rect.union_ip(merged.pop(index))
+            index = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
+
+
+class CrossOverlay:
+    """
+    One transparent, screen-sized surface that the landfall crosses of every storm are drawn on.
+    Crosses are drawn straight onto it and only the areas they cover are cleared and copied to the
+    screen, instead of allocating a surface per cross every frame.
+    """
+
+    def __init__(self, size):
+        self.surface = pygame.Surface(size, pygame.SRCALPHA)
+        self.drawn_rects = []
+
+    def draw(self, screen, crosses, view=None):
+        """Draw landfall crosses as diagonal X marks, zoomed and panned by the MapView if there is one. Returns the rects drawn."""
+        for rect in self.drawn_rects:
+            self.surface.fill((0, 0, 0, 0), rect)
+
+        rects = []
+        for cross in crosses:
+            if cross["fade_alpha"] <= 0:
+                continue
+            color = CROSS_COLOR + (int(cross["fade_alpha"]),)
+            cross_x, cross_y = cross["position"]
+            if view is not None:
+                cross_x, cross_y = view.to_screen(cross_x, cross_y)
+            line_length = int(4.5 * cross["scale"])  # Scale the line length
+            rect = pygame.draw.line(self.surface, color,
+                                    (cross_x - line_length, cross_y - line_length),
+                                    (cross_x + line_length, cross_y + line_length), CROSS_WIDTH)  # Top-left to bottom-right
+            rect.union_ip(pygame.draw.line(self.surface, color,
+                                           (cross_x - line_length, cross_y + line_length),
+                                           (cross_x + line_length, cross_y - line_length), CROSS_WIDTH))  # Bottom-left to top-right
+            rects.append(rect)
+
+        # Overlapping crosses are copied once, so their shared pixels are not blended twice
+        self.drawn_rects = merge_rects(rects)
+        for rect in self.drawn_rects:
+            screen.blit(self.surface, rect, rect)
+        return self.drawn_rects
@@ -0,0 +1,63 @@
+import pygame
+
+
+class FullRenderer:
+    """Redraws the whole background every frame and flips the display."""
+
+    def __init__(self, screen, background):
+        self.screen = screen
+        self.background = background
+
+    def begin_frame(self):
+        self.screen.blit(self.background, (0, 0))
+
+    def add(self, rects):
+        """Record rects drawn this frame. Only the dirty rect renderer needs them."""
+
+    def invalidate(self):
+        """Redraw the whole window next frame. The full renderer always does."""
+
+    def end_frame(self):
+        pygame.display.flip()
+
+
+class DirtyRectRenderer:
+    """
+    Only repaints what changed: every rect drawn in a frame is restored from the cached
+    background at the start of the next one, and the display is updated with just the
+    rects drawn in either frame instead of flipping the whole window.
+    """
+
+    def __init__(self, screen, background):
+        self.screen = screen
+        self.background = background
+        self.previous_rects = []
+        self.current_rects = []
+        self.full_redraw = True
+
+    def begin_frame(self):
+        if self.full_redraw:
+            self.screen.blit(self.background, (0, 0))
+        else:
+            for rect in self.previous_rects:
+                self.screen.blit(self.background, rect, rect)
+
+    def add(self, rects):
+        """Record a rect, or a list of rects, drawn this frame."""
+        if isinstance(rects, pygame.Rect):
+            self.current_rects.append(rects)
+        else:
+            self.current_rects.extend(rects)
+
+    def invalidate(self):
+        """Redraw and update the whole window next frame, e.g. after it was uncovered."""
+        self.full_redraw = True
+
+    def end_frame(self):
+        if self.full_redraw:
+            pygame.display.flip()
+            self.full_redraw = False
+        else:
+            pygame.display.update(self.previous_rects + self.current_rects)
+        self.previous_rects = self.current_rects
+        self.current_rects = []
@@ -0,0 +1,28 @@
+SIMULATION_STEP = 1 / 120  # Seconds simulated per step
+MAX_FRAME_TIME = 0.25  # Longer frames are cut short so a hitch does not queue up a burst of steps
+
+
+class FixedTimestep:
+    """
+    Accumulates variable frame times and hands them out as a whole number of fixed
+    simulation steps, so what is simulated does not depend on the frame rate.
+    """
+
+    def __init__(self, step=SIMULATION_STEP, max_frame_time=MAX_FRAME_TIME):
+        self.step = step
+        self.max_frame_time = max_frame_time
+        # Total time taken in and steps handed out, rather than a running remainder that would drift
+        self.total_time = 0.0
+        self.steps_taken = 0
+
+    def advance(self, frame_time):
+        """Add the duration in seconds of a frame. Returns the number of steps to simulate."""
+        self.total_time += min(frame_time, self.max_frame_time)
+        steps = int(self.total_time / self.step + 1e-9) - self.steps_taken
+        self.steps_taken += steps
+        return steps
+
+    @property
+    def alpha(self):
+        """How far between the last two simulated steps the current frame falls, from 0 to 1."""
+        return min(max(self.total_time / self.step - self.steps_taken, 0.0), 1.0)
@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import shapely
+from shapely.geometry import box
+import cartopy.crs as ccrs
+import cartopy.feature as cfeature
+from cartopy.io import shapereader
+
+CACHE_VERSION = 1
+# Natural Earth layers drawn on the maps, as (category, name)
+LAYERS = {
+    "land": ("physical", "land"),
+    "ocean": ("physical", "ocean"),
+    "borders": ("cultural", "admin_0_boundary_lines_land"),
+    "rivers": ("physical", "rivers_lake_centerlines"),
+    "lakes": ("physical", "lakes"),
+}
+# Land and ocean are always drawn at full resolution. The other layers use the scale
+# Cartopy's BORDERS, RIVERS and LAKES features would pick for the extent.
+FULL_RESOLUTION_LAYERS = ("land", "ocean")
+CLIP_MARGIN = 2  # Degrees kept around the extent, so outlines run past the edge of the map
+
+
+def get_cache_folder():
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'resources', 'geometry')
+
+
+def map_projection(basin_name):
+    # Central longitude must be adjusted for the Southern Pacific so that the map doesnt get cut in half
+    return ccrs.PlateCarree(central_longitude=180 if basin_name == 'Southern Pacific' else 0)
+
+
+def layer_resolutions(extent):
+    scale = cfeature.AdaptiveScaler('110m', (('50m', 50), ('10m', 15))).scale_from_extent(extent)
+    return {layer: '10m' if layer in FULL_RESOLUTION_LAYERS else scale for layer in LAYERS}
+
+
+def clip_boxes(extent):
+    """Boxes in longitude and latitude covering the extent. An extent past 180° wraps around into a second box."""
+    min_long, max_long, min_lat, max_lat = extent
+    boxes = []
+    for shift in (-360, 0, 360):
+        west, east = max(min_long - CLIP_MARGIN + shift, -180), min(max_long + CLIP_MARGIN + shift, 180)
+        if west < east:
+            boxes.append(box(west, max(min_lat - CLIP_MARGIN, -90), east, min(max_lat + CLIP_MARGIN, 90)))
+    return boxes
+
+
+def clip_layer(path, extent, projection):
+    """Clip the shapes of a Natural Earth shapefile to the extent and project them into the map's projection."""
+    geometries = np.array(list(shapereader.Reader(path).geometries()), dtype=object)
+    source_crs = ccrs.PlateCarree()
+    clipped = []
+    for clip_box in clip_boxes(extent):
+        nearby = geometries[shapely.intersects(geometries, clip_box)]
+        for geometry in shapely.intersection(nearby, clip_box):
+            if not geometry.is_empty:
+                # Projecting the clipped pieces is cheap. Projecting whole continents is what made maps slow.
+                clipped.append(projection.project_geometry(geometry, source_crs))
+    return [geometry for geometry in clipped if not geometry.is_empty]
+
+
+def cache_signature(basin_name, extent, sources):
+    """Fingerprint of everything the clipped geometries depend on."""
+    source_stats = {layer: [path, os.path.getsize(path), os.path.getmtime(path)] for layer, path in sources.items()}
+    key = [CACHE_VERSION, basin_name, list(extent), map_projection(basin_name).proj4_init, source_stats]
+    return hashlib.sha1(json.dumps(key).encode("utf-8")).hexdigest()
+
+
+def save_geometries(cache_file, signature, layers):
+    """Store each layer as its geometries' WKB back to back, with the offset where each one ends."""
+    arrays = {"signature": np.array(signature)}
+    for layer, geometries in layers.items():
+        wkbs = shapely.to_wkb(np.array(geometries, dtype=object)) if geometries else []
+        arrays[f"{layer}_wkb"] = np.frombuffer(b"".join(wkbs), dtype=np.uint8)
+        arrays[f"{layer}_ends"] = np.cumsum([len(wkb) for wkb in wkbs], dtype=np.int64)
+    temp_file = f"{cache_file}.tmp.npz"
+    np.savez_compressed(temp_file, **arrays)
+    os.replace(temp_file, cache_file)
+
+
+def load_geometries(cache_file, signature):
+    """Returns the cached layers, or None if the cache is missing or stale."""
+    if not os.path.exists(cache_file):
+        return None
+    try:
+        with np.load(cache_file) as data:
+            if str(data["signature"]) != signature:
+                return None
+            layers = {}
+            for layer in LAYERS:
+                wkb, ends = data[f"{layer}_wkb"].tobytes(), data[f"{layer}_ends"]
+                starts = np.concatenate(([0], ends[:-1]))
+                layers[layer] = list(shapely.from_wkb([wkb[start:end] for start, end in zip(starts, ends)]))
+            return layers
+    except (OSError, KeyError, ValueError) as e:
+        print(f"Error loading geometry cache {cache_file}: {e}")
+        return None
+
+
+def load_basin_geometries(basin_name, extent):
+    """
+    Natural Earth land, ocean, borders, rivers and lakes clipped to the extent of a basin's map
+    and projected into its projection (see map_projection), ready for GeoAxes.add_geometries.
+
+    They are read from resources/geometry/ when cached, and clipped from the global shapefiles
+    and cached otherwise. The cache is rebuilt when the extent or a shapefile changes.
+
+    Returns:
+        dict: A list of shapely geometries per layer in LAYERS.
+    """
+    resolutions = layer_resolutions(extent)
+    sources = {layer: shapereader.natural_earth(resolutions[layer], category, name)
+               for layer, (category, name) in LAYERS.items()}
+    cache_file = os.path.join(get_cache_folder(), f'{basin_name.lower().replace(" ", "_")}.npz')
+    signature = cache_signature(basin_name, extent, sources)
+
+    layers = load_geometries(cache_file, signature)
+    if layers is not None:
+        return layers
+
+    projection = map_projection(basin_name)
+    layers = {layer: clip_layer(path, extent, projection) for layer, path in sources.items()}
+    try:
+        os.makedirs(get_cache_folder(), exist_ok=True)
+        save_geometries(cache_file, signature, layers)
+        print(f"Geometries for {basin_name} cached to {cache_file}")
+    except OSError as e:
+        print(f"Could not cache geometries to {cache_file}: {e}")
+    return layers
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+CACHE_VERSION = 1
+# Samples taken per screen pixel of a segment's length, so no pixel along the path is skipped
+SAMPLES_PER_PIXEL = 2
+
+
+def project(lats, longs, boundaries, screen_width, screen_height):
+    """Vectorized version of Typhoon.latlon_to_screen for arrays of coordinates."""
+    min_lon, max_lon, min_lat, max_lat = boundaries
+    xs = (longs - min_lon) * (screen_width / (max_lon - min_lon))
+    ys = (max_lat - lats) * (screen_height / (max_lat - min_lat))
+    return xs, ys
+
+
+def compute_events(track, land_mask, boundaries, screen_width, screen_height):
+    """
+    Find where a track moves from water onto land.
+
+    Every segment is sampled at sub-pixel spacing along the straight line the typhoon travels,
+    so the result does not depend on the frame rate. Like the per-frame check, a track starts
+    out in water and leaving the map counts as reaching land.
+
+    Returns:
+        list: Events as dicts with the segment index ("step"), the fraction of the segment
+        travelled when the storm reaches land ("fraction") and the position ("lat", "long").
+    """
+    if len(track) < 2:
+        return []
+
+    lats = np.array([position['lat'] for position in track.positions], dtype=float)
+    longs = np.array([position['long'] for position in track.positions], dtype=float)
+    xs, ys = project(lats, longs, boundaries, screen_width, screen_height)
+
+    # Sample counts per segment, then the segment index and fraction of every sample.
+    # The first point is sampled on its own; each segment contributes the samples after its start.
+    counts = np.maximum(np.ceil(np.hypot(np.diff(xs), np.diff(ys)) * SAMPLES_PER_PIXEL), 1).astype(np.int64)
+    steps = np.repeat(np.arange(len(counts)), counts)
+    sample_numbers = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+    fractions = sample_numbers / np.repeat(counts, counts)
+    steps = np.concatenate(([0], steps))
+    fractions = np.concatenate(([0.0], fractions))
+
+    sample_lats = lats[steps] + (lats[np.minimum(steps + 1, len(lats) - 1)] - lats[steps]) * fractions
+    sample_longs = longs[steps] + (longs[np.minimum(steps + 1, len(longs) - 1)] - longs[steps]) * fractions
+    sample_xs, sample_ys = project(sample_lats, sample_longs, boundaries, screen_width, screen_height)
+
+    # int() truncates towards zero, which is how screen positions are rounded everywhere else
+    in_water = land_mask.is_water(np.trunc(sample_xs).astype(np.int64), np.trunc(sample_ys).astype(np.int64))
+    was_in_water = np.concatenate(([True], in_water[:-1]))
+
+    return [
+        {
+            "step": int(steps[i]),
+            "fraction": float(fractions[i]),
+            "lat": float(sample_lats[i]),
+            "long": float(sample_longs[i])
+        }
+        for i in np.flatnonzero(was_in_water & ~in_water)
+    ]
+
+
+def track_key(name, track):
+    """Identify a storm's track, so a track extended by a cache refresh gets its events recomputed."""
+    return f"{name}|{track.start_time}|{track.end_time}|{len(track)}"
+
+
+def mask_signature(land_mask, boundaries, screen_width, screen_height):
+    """Fingerprint of everything besides the track that the events depend on."""
+    digest = hashlib.sha1(land_mask.packed.tobytes())
+    digest.update(json.dumps([land_mask.width, land_mask.height, boundaries, screen_width, screen_height]).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def load_event_cache(cache_file, signature):
+    if not os.path.exists(cache_file):
+        return {}
+    try:
+        with open(cache_file, "r") as file:
+            cache = json.load(file)
+    except (OSError, ValueError) as e:
+        print(f"Error loading landfall cache {cache_file}: {e}")
+        return {}
+
+    if cache.get("version") != CACHE_VERSION or cache.get("signature") != signature:
+        return {}
+    return cache.get("storms", {})
+
+
+def attach_landfall_events(typhoons, year, basin_name, land_mask, boundaries, screen_width, screen_height, folder_path="data"):
+    """
+    Set typhoon['landfall_events'] for every typhoon, reading them from the basin-year's
+    landfall cache where possible and computing and caching the rest.
+    """
+    if not land_mask:
+        return
+
+    # Imported here so that importing this module does not pull in the scraper's dependencies
+    import typhoon_scraper as ty
+
+    cache_file = ty.get_cache_path(year, basin_name, folder_path, "landfall.json")
+    signature = mask_signature(land_mask, boundaries, screen_width, screen_height)
+    storms = load_event_cache(cache_file, signature)
+
+    computed = 0
+    for typhoon in typhoons:
+        key = track_key(typhoon['name'], typhoon['track'])
+        if key not in storms:
+            storms[key] = compute_events(typhoon['track'], land_mask, boundaries, screen_width, screen_height)
+            computed += 1
+        typhoon['landfall_events'] = storms[key]
+
+    if not computed:
+        return
+
+    try:
+        os.makedirs(folder_path, exist_ok=True)
+        temp_file = f"{cache_file}.tmp"
+        with open(temp_file, "w") as file:
+            json.dump({"version": CACHE_VERSION, "signature": signature, "storms": storms}, file)
+        os.replace(temp_file, cache_file)
+        print(f"Landfall events of {computed} storms cached to file: {cache_file}")
+    except OSError as e:
+        print(f"Could not cache landfall events to {cache_file}: {e}")
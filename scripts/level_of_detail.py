@@ -0,0 +1,55 @@
+# How much of each storm is drawn, from least to most
+DETAIL_GLYPH = 0  # A simple ring instead of the spinning blades, no labels
+DETAIL_NO_LABELS = 1  # Spinning blades without the name, wind speed and pressure
+DETAIL_FULL = 2
+
+# Storms on screen above which labels are dropped and above which blades become rings,
+# for the map at its default scale. Zooming in leaves room for proportionally more.
+LABEL_STORM_LIMIT = 10
+BLADE_STORM_LIMIT = 25
+
+# Frame budget governor tuning
+FRAME_TIME_SMOOTHING = 0.1  # Weight of the newest frame in the averaged frame time
+RAISE_DETAIL_BELOW = 0.6  # Fraction of the budget the frame time must drop under before detail goes back up
+DETAIL_CHANGE_COOLDOWN = 30  # Frames to wait after a change, so the average settles before the next one
+
+
+def detail_for_storm_count(storm_count, zoom=1.0):
+    """Most detail that keeps a crowded map readable. `zoom` is the map's scale relative to the default window."""
+    room = zoom * zoom
+    if storm_count > BLADE_STORM_LIMIT * room:
+        return DETAIL_GLYPH
+    if storm_count > LABEL_STORM_LIMIT * room:
+        return DETAIL_NO_LABELS
+    return DETAIL_FULL
+
+
+class FrameBudgetGovernor:
+    """
+    Lowers the detail level when frames take longer than the target frame rate allows, and raises
+    it again once they are well within budget. Frame times are averaged, and after each change the
+    governor waits for the average to settle, so a single slow frame does not make the detail flicker.
+    """
+
+    def __init__(self, target_fps):
+        self.budget_ms = 1000 / target_fps
+        self.frame_ms = None
+        self.detail = DETAIL_FULL
+        self.frames_since_change = 0
+
+    def record(self, frame_ms):
+        """Add the time in ms spent working on a frame. Returns the detail level allowed for the next one."""
+        if self.frame_ms is None:
+            self.frame_ms = frame_ms
+        else:
+            self.frame_ms += (frame_ms - self.frame_ms) * FRAME_TIME_SMOOTHING
+        self.frames_since_change += 1
+
+        if self.frames_since_change >= DETAIL_CHANGE_COOLDOWN:
+            if self.frame_ms > self.budget_ms and self.detail > DETAIL_GLYPH:
+                self.detail -= 1
+                self.frames_since_change = 0
+            elif self.frame_ms < self.budget_ms * RAISE_DETAIL_BELOW and self.detail < DETAIL_FULL:
+                self.detail += 1
+                self.frames_since_change = 0
+        return self.detail
@@ -0,0 +1,118 @@
+import json
+import os
+import threading
+import time
+
+INDEX_FILENAME = "year_link_index.json"
+
+# Seconds after which a year's links are revalidated against the server
+REVALIDATE_AFTER = 60 * 60
+
+
+class YearLinkIndex:
+    """
+    On-disk index of year -> basin -> storm links, shared by every basin scrape.
+
+    Each year page is downloaded once and its links for every basin are stored with the time
+    they were fetched. Stale entries are revalidated with a conditional request using the
+    ETag / Last-Modified headers of the original response, so an unchanged page is not
+    downloaded again.
+    """
+
+    def __init__(self, folder_path="data"):
+        self.path = os.path.join(folder_path, INDEX_FILENAME)
+        self.lock = threading.Lock()
+        self.year_locks = {}
+        with self.lock:
+            self.entries = self.load()
+
+    def load(self):
+        """Read the index from disk. Must be called with the lock held."""
+        if os.path.exists(self.path):
+            with open(self.path, "r") as file:
+                try:
+                    return json.load(file)
+                except json.JSONDecodeError:
+                    print(f"Error loading link index {self.path}. Starting a new one.")
+        return {}
+
+    def save(self):
+        """
+        Write the index atomically. Must be called with the lock held. Entries saved by another
+        index on the same folder in the meantime are kept, with this index's entries taking precedence.
+        """
+        self.entries = {**self.load(), **self.entries}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_file = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_file, "w") as file:
+            json.dump(self.entries, file, indent=4)
+        os.replace(temp_file, self.path)
+
+    def get_entry(self, year):
+        with self.lock:
+            return self.entries.get(str(year))
+
+    def put_entry(self, year, entry):
+        with self.lock:
+            self.entries[str(year)] = entry
+            self.save()
+
+    def year_lock(self, year):
+        with self.lock:
+            return self.year_locks.setdefault(str(year), threading.Lock())
+
+    def get_basin_links(self, year, url, fetcher, parse, max_age=None):
+        """
+        Return {basin: [relative storm links]} for the given year, fetching the year page only when needed.
+
+        Args:
+            year (int): Year of the page.
+            url (str): URL of the year page.
+            fetcher (PageFetcher): Fetcher used for the (conditional) request.
+            parse (callable): Turns the page HTML into {basin: [links]}, or None if the page is unusable.
+            max_age (float): Seconds a stored entry is trusted before it is revalidated. Defaults to REVALIDATE_AFTER.
+
+        Returns:
+            dict: Links per basin, or None if the page could not be retrieved and nothing is cached.
+        """
+        if max_age is None:
+            max_age = REVALIDATE_AFTER
+
+        # Basin scrapes of the same year wait for each other instead of all fetching the page
+        with self.year_lock(year):
+            entry = self.get_entry(year)
+            now = time.time()
+            if entry and now - entry["validated_at"] < max_age:
+                return entry["basins"]
+
+            headers = {}
+            if entry and entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry and entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+            response = fetcher.get(url, headers=headers)
+            if entry and response is not None and response.status_code == 304:
+                self.put_entry(year, {**entry, "validated_at": now})
+                return entry["basins"]
+
+            if response is None or response.status_code != 200:
+                status = response.status_code if response is not None else "no response"
+                if entry:
+                    print(f"Could not revalidate links for {year} ({status}). Using the cached links.")
+                    return entry["basins"]
+                print(f"Failed to retrieve page for year {year}: {status}")
+                return None
+
+            basins = parse(response.text)
+            if basins is None:
+                return entry["basins"] if entry else None
+
+            self.put_entry(year, {
+                "basins": basins,
+                "fetched_at": now,
+                "validated_at": now,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified")
+            })
+            return basins
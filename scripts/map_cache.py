@@ -0,0 +1,157 @@
+import hashlib
+import os
+import threading
+
+import pygame
+
+from map_maker import get_resource_path
+
+CACHE_VERSION = 1
+HEADER_PREFIX = b"STORMCHASER-MAP"
+
+
+def get_cache_folder():
+    # Next to the maps, which are found the same way in a bundled build
+    return get_resource_path('../resources/scaled')
+
+
+def fit_size(map_width, map_height, width, height):
+    """Size of a map scaled to fit the given size while maintaining the aspect ratio."""
+    aspect_ratio = map_width / map_height
+    new_width = width
+    new_height = int(new_width / aspect_ratio)
+
+    if new_height > height:
+        new_height = height
+        new_width = int(new_height * aspect_ratio)
+    return new_width, new_height
+
+
+# Hashes of the maps already read, by path, size and modification time, so each is only hashed once
+_source_hashes = {}
+
+
+def source_hash(image_path):
+    stat = os.stat(image_path)
+    key = (image_path, stat.st_size, stat.st_mtime)
+    if key not in _source_hashes:
+        digest = hashlib.sha1()
+        with open(image_path, "rb") as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(chunk)
+        _source_hashes[key] = digest.hexdigest()
+    return _source_hashes[key]
+
+
+def get_cache_path(image_path, width, height):
+    name = os.path.splitext(os.path.basename(image_path))[0]
+    return os.path.join(get_cache_folder(), f"{name}_{width}x{height}.rgb")
+
+
+def read_scaled_map(cache_path, signature):
+    """Returns the cached map as an RGB surface, or None if the cache is missing or stale."""
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        with open(cache_path, "rb") as file:
+            header = file.readline().split()
+            if len(header) != 5 or header[0] != HEADER_PREFIX or header[1:3] != [str(CACHE_VERSION).encode(), signature.encode()]:
+                return None
+            size = int(header[3]), int(header[4])
+            pixels = file.read()
+    except (OSError, ValueError) as e:
+        print(f"Error reading scaled map {cache_path}: {e}")
+        return None
+    if len(pixels) != size[0] * size[1] * 3:
+        return None
+    return pygame.image.frombuffer(pixels, size, "RGB")
+
+
+def write_scaled_map(cache_path, signature, size, pixels):
+    """Store the map as a one-line header followed by its raw RGB pixels, which load without decoding."""
+    width, height = size
+    temp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(b"%s %d %s %d %d\n" % (HEADER_PREFIX, CACHE_VERSION, signature.encode(), width, height))
+        file.write(pixels)
+    os.replace(temp_path, cache_path)
+
+
+def load_scaled_map(image_path, width, height):
+    """
+    Load a map scaled to fit width x height. Scaled maps are cached in resources/scaled/ as raw RGB,
+    keyed by the window size and the hash of the source image, so the PNG is only decoded and scaled
+    the first time and again when it changes.
+
+    The surface is not converted to the display format, so this can run in a background thread.
+
+    Returns:
+        pygame.Surface: The scaled map.
+    """
+    cache_path = get_cache_path(image_path, width, height)
+    signature = source_hash(image_path)
+    surface = read_scaled_map(cache_path, signature)
+    if surface is not None:
+        return surface
+
+    map_image = pygame.image.load(image_path)
+    size = fit_size(*map_image.get_size(), width, height)
+    # Any alpha channel is dropped, so a freshly scaled map is the same as one read from the cache
+    pixels = pygame.image.tobytes(pygame.transform.scale(map_image, size), "RGB")
+    try:
+        os.makedirs(get_cache_folder(), exist_ok=True)
+        write_scaled_map(cache_path, signature, size, pixels)
+    except OSError as e:
+        print(f"Could not cache scaled map to {cache_path}: {e}")
+    return pygame.image.frombuffer(pixels, size, "RGB")
+
+
+class ScaledMapCache:
+    """
+    Scaled maps for one window size, kept in memory in the display format once used.
+    preload() loads maps in a background thread, so they are ready by the time they are shown.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.lock = threading.Lock()
+        self.loaded = {}  # Loaded by the background thread, not yet converted
+        self.converted = {}
+
+    def get(self, image_path):
+        """Returns the scaled map in the display format. Must be called from the main thread."""
+        surface = self.converted.get(image_path)
+        if surface is not None:
+            return surface
+
+        with self.lock:
+            surface = self.loaded.pop(image_path, None)
+        if surface is None:
+            surface = load_scaled_map(image_path, self.width, self.height)
+        # Converting needs the display, which only the main thread may use
+        surface = surface.convert()
+        self.converted[image_path] = surface
+        return surface
+
+    def preload(self, image_paths):
+        """Load maps in a daemon thread. Paths that do not exist are skipped."""
+        def load_all():
+            for image_path in image_paths:
+                with self.lock:
+                    if image_path in self.loaded or image_path in self.converted:
+                        continue
+                if not os.path.exists(image_path):
+                    continue
+                try:
+                    surface = load_scaled_map(image_path, self.width, self.height)
+                except (OSError, pygame.error) as e:
+                    print(f"Error preloading map {image_path}: {e}")
+                    continue
+                with self.lock:
+                    if image_path not in self.converted:
+                        self.loaded[image_path] = surface
+
+        thread = threading.Thread(target=load_all, daemon=True)
+        thread.start()
+        return thread
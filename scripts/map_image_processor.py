@@ -1,5 +1,46 @@
+import os
+import numpy as np
 from PIL import Image
 
+# Color of the ocean on the simple maps
+WATER_COLOR = (0, 0, 70)
+
+
+class LandMask:
+    """Bit-packed water mask of a map image, one bit per pixel."""
+
+    def __init__(self, packed, width, height):
+        self.packed = packed
+        self.width = width
+        self.height = height
+
+    @classmethod
+    def from_image(cls, img, water_color=WATER_COLOR):
+        pixels = np.asarray(img.convert('RGB'))
+        water = np.all(pixels == np.array(water_color, dtype=pixels.dtype), axis=2)
+        return cls(np.packbits(water, axis=1), img.width, img.height)
+
+    def is_water(self, xs, ys):
+        """
+        Check which pixel coordinates are water. Coordinates outside the map count as land.
+
+        Args:
+            xs (int or array-like): X-coordinates of the pixels.
+            ys (int or array-like): Y-coordinates of the pixels.
+
+        Returns:
+            bool or np.ndarray: Whether each coordinate is water, in the shape of the inputs.
+        """
+        xs = np.asarray(xs, dtype=np.int64)
+        ys = np.asarray(ys, dtype=np.int64)
+        inside = (xs >= 0) & (ys >= 0) & (xs < self.width) & (ys < self.height)
+
+        result = np.zeros(inside.shape, dtype=bool)
+        xs, ys = np.broadcast_to(xs, inside.shape)[inside], np.broadcast_to(ys, inside.shape)[inside]
+        result[inside] = (self.packed[ys, xs >> 3] >> (7 - (xs & 7))) & 1
+        return bool(result) if result.ndim == 0 else result
+
+
 class MapImageProcessor:
     @staticmethod
     def load_image(image_path):
@@ -68,3 +109,44 @@ class MapImageProcessor:
         except Exception as e:
             # print(f"Error getting pixel color: {e}")
             return None
+
+    @staticmethod
+    def load_land_mask(image_path):
+        """
+        Load the land mask of a map image, building it and caching it next to the image if needed.
+
+        Args:
+            image_path (str): Path to the image file.
+
+        Returns:
+            LandMask: The water mask of the image, or None if the image could not be loaded.
+        """
+        mask_path = os.path.splitext(image_path)[0] + "_mask.npz"
+        try:
+            source_stat = os.stat(image_path)
+        except OSError:
+            print(f"Error: Image file not found at {image_path}")
+            return None
+
+        # Rebuild the mask whenever the map image has changed since it was cached
+        if os.path.exists(mask_path):
+            try:
+                with np.load(mask_path) as cached:
+                    if cached["source_size"] == source_stat.st_size and cached["source_mtime"] == int(source_stat.st_mtime):
+                        height, width = cached["shape"]
+                        return LandMask(cached["packed"], int(width), int(height))
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Error loading land mask {mask_path}: {e}")
+
+        img = MapImageProcessor.load_image(image_path)
+        if img is None:
+            return None
+        land_mask = LandMask.from_image(img)
+
+        try:
+            np.savez(mask_path, packed=land_mask.packed, shape=np.array([land_mask.height, land_mask.width]),
+                     source_size=source_stat.st_size, source_mtime=int(source_stat.st_mtime))
+            print(f"Land mask cached to file: {mask_path}")
+        except OSError as e:
+            print(f"Could not cache land mask to {mask_path}: {e}")
+        return land_mask
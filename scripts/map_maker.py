@@ -1,9 +1,10 @@
+import argparse
 import os
 import sys
-import matplotlib.pyplot as plt
-import cartopy.crs as ccrs
-import cartopy.feature as cfeature
-from PIL import Image  # For resizing simple maps
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+# Matplotlib, Cartopy and the modules using them are only imported once a map has to be drawn.
+# The app imports this module for the paths of the maps it ships with, and should start without them.
 
 BASINS = {
     "Western Pacific": [100, 180, 0, 60],
@@ -62,62 +63,81 @@ def adjust_to_aspect_ratio(extent, target_aspect_ratio=4 / 3):
 
     return [min_long, max_long, min_lat, max_lat]
 
-def create_basin_map(basin_name, extent, output_path=None, detailed=True):
-    """Creates and saves a map of the specified typhoon basin, or returns the cached version."""
+def map_output_path(basin_name, detailed=True):
     base_path = os.path.dirname(os.path.abspath(__file__))
     project_root = os.path.dirname(base_path)
     resources_path = os.path.join(project_root, 'resources')
+    suffix = "detailed" if detailed else "simple"
+    return os.path.join(resources_path, f'{basin_name.lower().replace(" ", "_")}_{suffix}_map.png')
 
+def create_basin_map(basin_name, extent, output_path=None, detailed=True, overwrite=False):
+    """
+    Creates and saves a map of the specified typhoon basin, or returns the cached version.
+    The map is written to a temporary file first and moved into place once it is complete,
+    so a crashed or parallel run never leaves a half-written map behind.
+    """
     # Generate the output path if not specified
     if output_path is None:
-        suffix = "detailed" if detailed else "simple"
-        output_path = os.path.join(resources_path, f'{basin_name.lower().replace(" ", "_")}_{suffix}_map.png')
+        output_path = map_output_path(basin_name, detailed)
 
     ensure_resources_folder()
 
     # Check if the file already exists
-    if os.path.exists(output_path):
+    if os.path.exists(output_path) and not overwrite:
         print(f"Map for {basin_name} ({'detailed' if detailed else 'simple'}) already exists at {output_path}. Using the cached version.")
         return output_path
 
+    import matplotlib.pyplot as plt
+    import cartopy.crs as ccrs
+    from geometry_cache import load_basin_geometries, map_projection
+    from map_tiles import build_tile_pyramid
+
     # Adjust the extent to fit the 4:3 aspect ratio
     adjusted_extent = adjust_to_aspect_ratio(extent)
 
+    # Natural Earth shapes clipped to the map and already in its projection, so nothing global is reprojected here.
+    # This used to make the Southern Pacific, whose projection is centered on 180°, very slow.
+    geometries = load_basin_geometries(basin_name, adjusted_extent)
+    projection = map_projection(basin_name)
+
     fig = plt.figure(figsize=(8, 6), dpi=300)  # 4:3 aspect ratio
-    # Central longitude must be adjusted for the Southern Pacific sso that the map doesnt get cut in half. 
-    # Do note that a nonzero central lomngitude takes a LOT more time to generate maps because it has to recompute each vector to the new one.
-    # This is a solution that unforuntately compromises time.
-    ax = fig.add_subplot(111, projection=ccrs.PlateCarree(central_longitude=180 if basin_name == 'Southern Pacific' else 0))
+    ax = fig.add_subplot(111, projection=projection)
 
     ax.set_extent(adjusted_extent, crs=ccrs.PlateCarree())
 
-    # Add features
-    ax.add_feature(cfeature.NaturalEarthFeature('physical', 'land', '10m', facecolor='darkgreen'))
-    ax.add_feature(cfeature.NaturalEarthFeature('physical', 'ocean', '10m', facecolor=rgb_to_normalized(0, 0, 70)))
+    # Add features, styled as Cartopy's LAND, OCEAN, BORDERS, RIVERS and LAKES features with the colors below
+    ax.add_geometries(geometries['land'], crs=projection, facecolor='darkgreen')
+    ax.add_geometries(geometries['ocean'], crs=projection, facecolor=rgb_to_normalized(0, 0, 70))
     if detailed:
         # Add more detailed features
-        ax.add_feature(cfeature.BORDERS, linestyle=':', edgecolor='black', linewidth=1)
-        ax.add_feature(cfeature.RIVERS, edgecolor=rgb_to_normalized(0, 0, 70), linewidth=0.5)
-        ax.add_feature(cfeature.LAKES, facecolor=rgb_to_normalized(0, 0, 70))
+        ax.add_geometries(geometries['borders'], crs=projection, facecolor='never', linestyle=':', edgecolor='black', linewidth=1)
+        ax.add_geometries(geometries['rivers'], crs=projection, facecolor='never', edgecolor=rgb_to_normalized(0, 0, 70), linewidth=0.5)
+        ax.add_geometries(geometries['lakes'], crs=projection, edgecolor='none', facecolor=rgb_to_normalized(0, 0, 70))
         ax.stock_img(zorder=3).set_alpha(0.35)  # Semi-transparent stock image overlay
 
     # Adjust layout
     plt.subplots_adjust(left=0, right=1, top=1, bottom=0)
     
     # Save the image
+    temp_path = f"{output_path}.{os.getpid()}.tmp"
     if detailed:
-        plt.savefig(output_path, dpi=300, bbox_inches='tight', pad_inches=0)
+        plt.savefig(temp_path, format='png', dpi=300, bbox_inches='tight', pad_inches=0)
     else:
         # Disable antialiasing by using lower DPI and rasterizing features
-        plt.savefig(output_path, dpi=150, bbox_inches='tight', pad_inches=0, transparent=True)
+        plt.savefig(temp_path, format='png', dpi=150, bbox_inches='tight', pad_inches=0, transparent=True)
     
-    plt.close()
-
-    print(f"Map for {basin_name} ({'detailed' if detailed else 'simple'}) saved to {output_path}")
+    plt.close(fig)
 
     if not detailed:
         # Resize simple maps to 1200x900
-        resize_image(output_path, 1200, 900)
+        resize_image(temp_path, 1200, 900)
+
+    os.replace(temp_path, output_path)
+    print(f"Map for {basin_name} ({'detailed' if detailed else 'simple'}) saved to {output_path}")
+
+    if detailed:
+        # The animation window draws detailed maps from tiles, so it can zoom in without loading the whole map
+        build_tile_pyramid(output_path)
 
     return output_path
 
@@ -126,9 +146,11 @@ def create_basin_map(basin_name, extent, output_path=None, detailed=True):
 
 def resize_image(image_path, width, height):
     """Resizes the image to the specified dimensions."""
+    from PIL import Image
+
     with Image.open(image_path) as img:
         img_resized = img.resize((width, height))
-        img_resized.save(image_path)
+        img_resized.save(image_path, format=img.format)
         print(f"Resized image saved at {image_path} to {width}x{height} dimensions.")
 
 
@@ -168,17 +190,98 @@ def get_simple_map_image(basin_name="Western Pacific"):
     return create_basin_map(basin_name, extent, detailed=False)
 
 
-def main():
+def prefetch_natural_earth():
+    """
+    Download the Natural Earth data the maps use before any worker needs it. Cartopy downloads
+    missing data on first use, and workers doing that at the same time would write the same files.
+    """
+    from cartopy.io import shapereader
+    from geometry_cache import LAYERS, layer_resolutions
 
-    print("Available Basins:")
-    for basin in BASINS:
-        extent = BASINS[basin]
-        detailed_map, simple_map = generate_basin_maps(basin, extent)
+    datasets = set()
+    for extent in BASINS.values():
+        for layer, resolution in layer_resolutions(adjust_to_aspect_ratio(extent)).items():
+            datasets.add((resolution,) + LAYERS[layer])
+    for resolution, category, name in sorted(datasets):
+        try:
+            shapereader.natural_earth(resolution, category, name)
+        except Exception as e:
+            print(f"Could not prefetch Natural Earth {name} ({resolution}): {e}")
 
-        print(f"Detailed map saved at: {detailed_map}")
-        print(f"Simple map saved at: {simple_map}")
 
-    print("done")
+def prepare_geometries_job(basin_name):
+    """Clip and cache a basin's geometries in a worker process, once for both of its maps."""
+    from geometry_cache import load_basin_geometries
+
+    load_basin_geometries(basin_name, adjust_to_aspect_ratio(BASINS[basin_name]))
+    return basin_name
+
+
+def generate_map_job(basin_name, detailed, overwrite=False):
+    """Generate one map in a worker process. Returns the basin, variant, path and seconds taken."""
+    start = time.perf_counter()
+    path = create_basin_map(basin_name, BASINS[basin_name], detailed=detailed, overwrite=overwrite)
+    return basin_name, "detailed" if detailed else "simple", path, time.perf_counter() - start
+
+
+def generate_all_maps(basins=None, workers=None, overwrite=False):
+    """
+    Generate the detailed and simple map of every basin, one process pool job per map.
+    Every map renders on its own, so with enough workers a full run takes about as long as the slowest map.
+
+    Returns:
+        list: (basin, variant, path, seconds) of every map that was generated or found cached.
+    """
+    basins = basins or list(BASINS)
+    jobs = [(basin_name, detailed) for basin_name in basins for detailed in (True, False)]
+    # Start the slowest maps first so they are not left running alone at the end:
+    # the reprojected Southern Pacific, then the detailed maps
+    jobs.sort(key=lambda job: (job[0] != 'Southern Pacific', not job[1]))
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+
+    ensure_resources_folder()
+    prefetch_natural_earth()
+
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(workers) as executor:
+        # Both maps of a basin are drawn from the same clipped geometries, so those are cached first
+        missing = sorted({basin_name for basin_name, detailed in jobs
+                          if overwrite or not os.path.exists(map_output_path(basin_name, detailed))})
+        for future in as_completed([executor.submit(prepare_geometries_job, basin_name) for basin_name in missing]):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Failed to prepare geometries: {e}")
+
+        futures = {executor.submit(generate_map_job, basin_name, detailed, overwrite): (basin_name, detailed)
+                   for basin_name, detailed in jobs}
+        for future in as_completed(futures):
+            basin_name, detailed = futures[future]
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"Failed to generate the {'detailed' if detailed else 'simple'} map for {basin_name}: {e}")
+    elapsed = time.perf_counter() - start
+
+    print(f"\n{'Basin':<20}{'Variant':<10}{'Seconds':>8}")
+    for basin_name, variant, _, seconds in sorted(results, key=lambda result: result[3], reverse=True):
+        print(f"{basin_name:<20}{variant:<10}{seconds:>8.1f}")
+    total = sum(result[3] for result in results)
+    print(f"Generated {len(results)} of {len(jobs)} maps with {workers} workers in {elapsed:.1f} s ({total:.1f} s of map work)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the detailed and simple map of every basin.")
+    parser.add_argument("--basins", nargs="+", choices=list(BASINS), metavar="BASIN",
+                        help=f"Basins to generate. Defaults to all of: {', '.join(BASINS)}.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Number of maps generated at once. Defaults to the number of CPUs.")
+    parser.add_argument("--overwrite", action="store_true", help="Generate maps again even if they already exist.")
+    args = parser.parse_args()
+
+    generate_all_maps(args.basins, args.workers, args.overwrite)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,258 @@
+import json
+import os
+import shutil
+
+import pygame
+from PIL import Image
+
+from sprite_cache import SpriteCache
+
+TILE_SIZE = 256
+TILE_CACHE_MEMORY = 48 * 1024 * 1024  # bytes of loaded and scaled tiles kept around
+PYRAMID_VERSION = 1
+MAX_ZOOM = 8
+ZOOM_STEP = 1.25  # Zoom factor per mouse wheel notch
+
+
+def get_pyramid_folder(image_path):
+    """Tiles of resources/{name}.png live in resources/tiles/{name}/."""
+    name = os.path.splitext(os.path.basename(image_path))[0]
+    return os.path.join(os.path.dirname(image_path), "tiles", name)
+
+
+def source_signature(image_path):
+    return {"version": PYRAMID_VERSION, "size": os.path.getsize(image_path), "mtime": os.path.getmtime(image_path)}
+
+
+def cut_levels(image_path, tile_size=TILE_SIZE):
+    """The map at full resolution followed by every halved level, down to a level that fits in a single tile."""
+    with Image.open(image_path) as source:
+        image = source.convert("RGB")
+    images = [image]
+    while image.width > tile_size or image.height > tile_size:
+        image = image.resize((max(image.width // 2, 1), max(image.height // 2, 1)), Image.LANCZOS)
+        images.append(image)
+    return images
+
+
+def save_tile_pyramid(image_path, images, tile_size=TILE_SIZE):
+    """
+    Save the levels of a map as {level}/{column}_{row}.png tiles next to a pyramid.json describing them.
+
+    The pyramid is written to a temporary folder and moved into place once complete. Raises OSError if
+    it cannot be written or moved into place, for example when another process put a pyramid there first.
+
+    Returns:
+        str: The pyramid folder.
+    """
+    folder = get_pyramid_folder(image_path)
+    temp_folder = f"{folder}.{os.getpid()}.tmp"
+    shutil.rmtree(temp_folder, ignore_errors=True)
+
+    try:
+        for level, image in enumerate(images):
+            level_folder = os.path.join(temp_folder, str(level))
+            os.makedirs(level_folder)
+            width, height = image.size
+            for top in range(0, height, tile_size):
+                for left in range(0, width, tile_size):
+                    tile = image.crop((left, top, min(left + tile_size, width), min(top + tile_size, height)))
+                    tile.save(os.path.join(level_folder, f"{left // tile_size}_{top // tile_size}.png"))
+
+        levels = [{"width": image.width, "height": image.height} for image in images]
+        with open(os.path.join(temp_folder, "pyramid.json"), "w") as file:
+            json.dump({"source": source_signature(image_path), "tile_size": tile_size, "levels": levels}, file)
+
+        shutil.rmtree(folder, ignore_errors=True)
+        os.replace(temp_folder, folder)
+    except OSError:
+        shutil.rmtree(temp_folder, ignore_errors=True)
+        raise
+
+    print(f"Tile pyramid of {image_path} with {len(images)} levels saved to {folder}")
+    return folder
+
+
+def build_tile_pyramid(image_path, tile_size=TILE_SIZE):
+    """
+    Cut a map into fixed-size tiles at several zoom levels: level 0 is the full resolution and every
+    following level halves it, down to a level that fits in a single tile. See save_tile_pyramid().
+
+    Returns:
+        str: The pyramid folder.
+    """
+    return save_tile_pyramid(image_path, cut_levels(image_path, tile_size), tile_size)
+
+
+def read_pyramid_meta(image_path):
+    """The pyramid.json of a map's saved pyramid, or None if it is missing or the map has changed since."""
+    try:
+        with open(os.path.join(get_pyramid_folder(image_path), "pyramid.json"), "r") as file:
+            meta = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if meta.get("source") != source_signature(image_path):
+        return None
+    return meta
+
+
+def load_tile_pyramid(image_path):
+    """
+    Returns the TilePyramid of a map, building it first if it is missing or the map has changed.
+    If the pyramid cannot be saved, for example in a read-only install, it is kept in memory instead.
+    """
+    meta = read_pyramid_meta(image_path)
+    if meta is None:
+        images = cut_levels(image_path)
+        try:
+            save_tile_pyramid(image_path, images)
+        except OSError as e:
+            print(f"Could not save the tile pyramid of {image_path}: {e}")
+        # Also read back after a failed save, in case another process saved the same pyramid first
+        meta = read_pyramid_meta(image_path)
+        if meta is None:
+            print(f"Keeping the tile pyramid of {image_path} in memory.")
+            return MemoryTilePyramid(images, TILE_SIZE)
+    return TilePyramid(get_pyramid_folder(image_path), meta["tile_size"], meta["levels"])
+
+
+class TilePyramid:
+    def __init__(self, folder, tile_size, levels):
+        self.folder = folder
+        self.tile_size = tile_size
+        self.levels = levels  # {"width", "height"} of every level, full resolution first
+
+    @property
+    def width(self):
+        return self.levels[0]["width"]
+
+    @property
+    def height(self):
+        return self.levels[0]["height"]
+
+    def tile_path(self, level, column, row):
+        return os.path.join(self.folder, str(level), f"{column}_{row}.png")
+
+    def load_tile(self, level, column, row):
+        """Returns a tile as a surface that is not converted to the display format."""
+        return pygame.image.load(self.tile_path(level, column, row))
+
+
+class MemoryTilePyramid(TilePyramid):
+    """A tile pyramid that could not be saved. Tiles are cut from the level images when they are loaded."""
+
+    def __init__(self, images, tile_size):
+        super().__init__(None, tile_size, [{"width": image.width, "height": image.height} for image in images])
+        self.images = images
+
+    def load_tile(self, level, column, row):
+        image = self.images[level]
+        left, top = column * self.tile_size, row * self.tile_size
+        tile = image.crop((left, top, min(left + self.tile_size, image.width), min(top + self.tile_size, image.height)))
+        return pygame.image.frombuffer(tile.tobytes(), tile.size, "RGB")
+
+
+class MapView:
+    """
+    Zoom and pan of the animation window. Positions on the unzoomed map, which fills the window
+    the way the single scaled map image used to, are mapped to the screen by to_screen().
+    """
+
+    def __init__(self, screen_width, screen_height, map_width, map_height):
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.map_width = map_width
+        self.map_height = map_height
+        self.reset()
+
+    def reset(self):
+        self.zoom = 1.0
+        self.offset_x = 0.0  # Unzoomed position at the top-left corner of the screen
+        self.offset_y = 0.0
+
+    @property
+    def state(self):
+        return self.zoom, self.offset_x, self.offset_y
+
+    def to_screen(self, x, y):
+        return int((x - self.offset_x) * self.zoom), int((y - self.offset_y) * self.zoom)
+
+    def zoom_at(self, screen_position, factor):
+        """Zoom by a factor while keeping the point under the screen position in place."""
+        screen_x, screen_y = screen_position
+        anchor_x = self.offset_x + screen_x / self.zoom
+        anchor_y = self.offset_y + screen_y / self.zoom
+        self.zoom = min(max(self.zoom * factor, 1.0), MAX_ZOOM)
+        self.offset_x = anchor_x - screen_x / self.zoom
+        self.offset_y = anchor_y - screen_y / self.zoom
+        self.clamp()
+
+    def pan(self, dx, dy):
+        """Move the map by a distance in screen pixels."""
+        self.offset_x -= dx / self.zoom
+        self.offset_y -= dy / self.zoom
+        self.clamp()
+
+    def clamp(self):
+        # Keep the map covering the screen, or pinned to the top-left where it is smaller
+        self.offset_x = min(max(self.offset_x, 0.0), max(self.map_width - self.screen_width / self.zoom, 0.0))
+        self.offset_y = min(max(self.offset_y, 0.0), max(self.map_height - self.screen_height / self.zoom, 0.0))
+
+
+class TiledMap:
+    """
+    Draws the part of a tile pyramid a MapView shows. Only visible tiles are loaded, from the
+    coarsest level that still has enough resolution for the zoom, and both loaded and scaled
+    tiles are kept in a memory-capped LRU cache, so the full-resolution map is never in memory.
+    """
+
+    def __init__(self, pyramid, view, cache=None):
+        self.pyramid = pyramid
+        self.view = view
+        self.cache = cache or SpriteCache(TILE_CACHE_MEMORY)
+
+    def choose_level(self):
+        """Coarsest level with at least one pixel per screen pixel at the current zoom."""
+        needed_width = self.view.map_width * self.view.zoom
+        level = 0
+        while level + 1 < len(self.pyramid.levels) and self.pyramid.levels[level + 1]["width"] >= needed_width:
+            level += 1
+        return level
+
+    def load_tile(self, level, column, row):
+        return self.cache.get(
+            ("tile", level, column, row),
+            lambda: self.pyramid.load_tile(level, column, row).convert()
+        )
+
+    def draw(self, surface):
+        view = self.view
+        level = self.choose_level()
+        level_width, level_height = self.pyramid.levels[level]["width"], self.pyramid.levels[level]["height"]
+        tile_size = self.pyramid.tile_size
+        # Level pixels per unzoomed map pixel
+        scale = level_width / view.map_width
+
+        # Visible area in level pixels
+        left = view.offset_x * scale
+        top = view.offset_y * scale
+        right = min(left + view.screen_width / view.zoom * scale, level_width)
+        bottom = min(top + view.screen_height / view.zoom * scale, level_height)
+
+        for row in range(int(top // tile_size), int((bottom - 1) // tile_size) + 1):
+            for column in range(int(left // tile_size), int((right - 1) // tile_size) + 1):
+                tile_left, tile_top = column * tile_size, row * tile_size
+                tile_right = min(tile_left + tile_size, level_width)
+                tile_bottom = min(tile_top + tile_size, level_height)
+                # Screen edges are rounded from the tile edges, so neighbouring tiles never leave a gap
+                screen_left, screen_top = view.to_screen(tile_left / scale, tile_top / scale)
+                screen_right, screen_bottom = view.to_screen(tile_right / scale, tile_bottom / scale)
+                size = (screen_right - screen_left, screen_bottom - screen_top)
+                if size[0] <= 0 or size[1] <= 0:
+                    continue
+
+                scaled_tile = self.cache.get(
+                    ("scaled", level, column, row, size),
+                    lambda: pygame.transform.smoothscale(self.load_tile(level, column, row), size)
+                )
+                surface.blit(scaled_tile, (screen_left, screen_top))
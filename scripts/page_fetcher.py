@@ -0,0 +1,104 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_TIMEOUT = 30
+
+# Maximum requests per second for each host. Hosts not listed here are not throttled.
+HOST_RATE_LIMITS = {
+    "ncics.org": 4.0
+}
+
+
+class HostRateLimiter:
+    """Spaces out requests so that no host receives more than its configured rate."""
+
+    def __init__(self, rate_limits=None):
+        self.rate_limits = dict(HOST_RATE_LIMITS if rate_limits is None else rate_limits)
+        self.next_slot = {}
+        self.lock = threading.Lock()
+
+    def wait(self, url):
+        """Block until a request to the host of the given URL is allowed."""
+        host = urlparse(url).hostname
+        rate = self.rate_limits.get(host)
+        if not rate:
+            return
+
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + 1.0 / rate
+
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class PageFetcher:
+    """Fetches pages over a pooled session with a bounded number of worker threads."""
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, rate_limits=None, timeout=DEFAULT_TIMEOUT, session=None):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.rate_limiter = HostRateLimiter(rate_limits)
+        self.session = session or self.create_session(max_workers)
+
+    @staticmethod
+    def create_session(pool_size):
+        """Create a session whose connection pool can serve every worker at once."""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def get(self, url, headers=None):
+        """Fetch a single URL and return the response, or None if the request failed."""
+        self.rate_limiter.wait(url)
+        try:
+            return self.session.get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            print(f"Failed to retrieve page {url}: {e}")
+            return None
+
+    def fetch_text(self, url):
+        """Fetch a single URL and return its body, or None if it could not be retrieved."""
+        response = self.get(url)
+        if response is None:
+            return None
+        if response.status_code != 200:
+            print(f"Failed to retrieve page {url}: {response.status_code}")
+            return None
+        return response.text
+
+    def map(self, func, urls):
+        """
+        Fetch every URL concurrently and apply func(url, html) to each page.
+
+        Results are returned in the same order as the given URLs. Pages that
+        could not be retrieved are passed to func with html set to None.
+        """
+        urls = list(urls)
+        if not urls:
+            return []
+
+        def work(url):
+            return func(url, self.fetch_text(url))
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(urls))) as executor:
+            return list(executor.map(work, urls))
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
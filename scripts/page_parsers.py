@@ -0,0 +1,371 @@
+import os
+from html.parser import HTMLParser
+from bs4 import BeautifulSoup
+from bs4.dammit import EntitySubstitution
+
+# Parser backend used when none is requested explicitly
+DEFAULT_PARSER = os.getenv("STORMCHASER_PARSER", "stream")
+
+
+class BeautifulSoupParser:
+    """Reference parser that builds a full BeautifulSoup tree of each page."""
+    name = "bs4"
+
+    def parse_year_page(self, html):
+        """Extract the storm links of each basin from the second layout table of a year page."""
+        soup = BeautifulSoup(html, 'html.parser')
+        tables = soup.find_all('table', {'class': 'ishade', 'summary': 'Layout table.'})
+
+        if len(tables) < 2:
+            print("Less than two tables found on the page.")
+            return None
+
+        table = tables[1]
+
+        headers = table.find('tr').find_all('td')
+        basins = [header.text.strip() for header in headers]
+
+        basin_links = {basin: [] for basin in basins}
+
+        rows = table.find_all('tr')[1:]
+        for row in rows:
+            cells = row.find_all('td')
+            for index, cell in enumerate(cells):
+                links = cell.find_all('a', href=True)
+                for link in links:
+                    basin_links[basins[index]].append(link['href'])
+
+        return basin_links
+
+    def parse_storm_page(self, html):
+        """Extract the storm name and the rows of the fourth (track) table of a storm page."""
+        soup = BeautifulSoup(html, 'html.parser')
+        return self.extract_typhoon_name(soup), self.extract_fourth_table(soup)
+
+    @staticmethod
+    def extract_typhoon_name(soup):
+        name_element = soup.find('h1')
+        if name_element:
+            return name_element.get_text(strip=True)
+        return None
+
+    @staticmethod
+    def extract_fourth_table(soup):
+        tables = soup.find_all('table')
+
+        if len(tables) < 4:
+            print("Less than four tables found on the page.")
+            return None
+
+        table = tables[3]
+        rows = table.find_all('tr')
+        table_data = []
+
+        for row in rows[2:]:
+            cells = row.find_all(['td', 'th'])
+            row_data = [cell.text.strip() for cell in cells]
+            table_data.append(row_data)
+
+        return table_data
+
+
+#####################
+# Streaming backend #
+#####################
+
+class _Element:
+    """Minimal stand-in for a BeautifulSoup tag inside a captured subtree."""
+    __slots__ = ("name", "attrs", "children")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.children = []
+
+    def descendants(self, names):
+        """Yield every descendant element with one of the given names, in document order."""
+        for child in self.children:
+            if isinstance(child, _Element):
+                if child.name in names:
+                    yield child
+                yield from child.descendants(names)
+
+    def strings(self):
+        for child in self.children:
+            if isinstance(child, _Element):
+                yield from child.strings()
+            else:
+                yield child
+
+    @property
+    def text(self):
+        return "".join(self.strings())
+
+
+class _StopParsing(Exception):
+    pass
+
+
+class _ElementCapture(HTMLParser):
+    """
+    Tokenizes a page with html.parser and keeps only the subtrees of the requested elements.
+
+    Tags are opened and closed with the same rules BeautifulSoup applies on top of
+    html.parser, so the captured subtrees match the ones BeautifulSoup would build.
+    Everything outside the targets is discarded, and parsing stops as soon as every
+    target element has been closed.
+    """
+    VOID_ELEMENTS = {
+        'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link', 'menuitem', 'meta',
+        'param', 'source', 'track', 'wbr', 'basefont', 'bgsound', 'command', 'frame', 'image', 'isindex',
+        'nextid', 'spacer'
+    }
+    # Text inside these tags is not part of an element's text in BeautifulSoup
+    STRING_CONTAINERS = {'rt', 'rp', 'style', 'script', 'template'}
+    PRESERVE_WHITESPACE = {'pre', 'textarea'}
+    ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+
+    def __init__(self, targets):
+        """
+        Args:
+            targets (list): (predicate, occurrence) pairs. predicate(name, attrs) selects candidate
+                elements and occurrence is the zero-based index of the candidate to capture.
+        """
+        super().__init__(convert_charrefs=False)
+        self.targets = targets
+        self.matches = [0] * len(targets)
+        self.captured = [None] * len(targets)
+        self.remaining = len(targets)
+        self.stack = []  # (name, element or None) for every open tag
+        self.open_counts = {}
+        self.capture_depth = 0
+        self.container_depth = 0
+        self.preserve_depth = 0
+        self.already_closed = []
+        self.pending_data = []
+
+    def run(self, html):
+        try:
+            self.feed(html)
+            self.close()
+        except _StopParsing:
+            pass
+        return self.captured
+
+    # Text
+
+    def flush(self, keep=True):
+        if not self.pending_data:
+            return
+        data = "".join(self.pending_data)
+        self.pending_data = []
+        if not keep or not self.capture_depth or self.container_depth:
+            return
+
+        if not self.preserve_depth and not data.strip(self.ASCII_SPACES):
+            data = "\n" if "\n" in data else " "
+        self.stack[-1][1].children.append(data)
+
+    def handle_data(self, data):
+        self.pending_data.append(data)
+
+    def handle_charref(self, name):
+        if name.startswith('x'):
+            real_name = int(name.lstrip('x'), 16)
+        elif name.startswith('X'):
+            real_name = int(name.lstrip('X'), 16)
+        else:
+            real_name = int(name)
+
+        data = None
+        if real_name < 256:
+            try:
+                data = bytearray([real_name]).decode('windows-1252')
+            except UnicodeDecodeError:
+                pass
+        if not data:
+            try:
+                data = chr(real_name)
+            except (ValueError, OverflowError):
+                pass
+        self.handle_data(data or "\N{REPLACEMENT CHARACTER}")
+
+    def handle_entityref(self, name):
+        character = EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name)
+        self.handle_data(character if character is not None else f"&{name}")
+
+    def handle_comment(self, data):
+        self.flush()
+
+    def handle_decl(self, data):
+        self.flush()
+
+    def handle_pi(self, data):
+        self.flush()
+
+    def unknown_decl(self, data):
+        self.flush()
+        if data.upper().startswith('CDATA['):
+            # CDATA sections count as text even inside string containers
+            self.pending_data.append(data[len('CDATA['):])
+            container_depth, self.container_depth = self.container_depth, 0
+            self.flush()
+            self.container_depth = container_depth
+
+    # Tags
+
+    def handle_starttag(self, name, attrs, handle_empty_element=True):
+        self.flush()
+        attr_dict = {}
+        for key, value in attrs:
+            attr_dict[key] = '' if value is None else value
+
+        element = None
+        if self.capture_depth:
+            element = _Element(name, attr_dict)
+            self.stack[-1][1].children.append(element)
+
+        for index, (predicate, occurrence) in enumerate(self.targets):
+            if self.captured[index] is None and predicate(name, attr_dict):
+                if self.matches[index] == occurrence:
+                    if element is None:
+                        element = _Element(name, attr_dict)
+                    self.captured[index] = element
+                self.matches[index] += 1
+
+        self.stack.append((name, element))
+        self.open_counts[name] = self.open_counts.get(name, 0) + 1
+        if element is not None:
+            self.capture_depth += 1
+        if name in self.STRING_CONTAINERS:
+            self.container_depth += 1
+        if name in self.PRESERVE_WHITESPACE:
+            self.preserve_depth += 1
+
+        if handle_empty_element and name in self.VOID_ELEMENTS:
+            self.handle_endtag(name, check_already_closed=False)
+            self.already_closed.append(name)
+
+    def handle_startendtag(self, name, attrs):
+        self.handle_starttag(name, attrs, handle_empty_element=False)
+        self.handle_endtag(name)
+
+    def handle_endtag(self, name, check_already_closed=True):
+        if check_already_closed and name in self.already_closed:
+            self.already_closed.remove(name)
+            return
+
+        self.flush()
+        if not self.open_counts.get(name):
+            return
+        while True:
+            popped_name, element = self.stack.pop()
+            self.open_counts[popped_name] -= 1
+            if element is not None:
+                self.capture_depth -= 1
+                if any(captured is element for captured in self.captured):
+                    self.remaining -= 1
+            if popped_name in self.STRING_CONTAINERS:
+                self.container_depth -= 1
+            if popped_name in self.PRESERVE_WHITESPACE:
+                self.preserve_depth -= 1
+            if popped_name == name:
+                break
+
+        if self.remaining == 0:
+            raise _StopParsing()
+
+    def close(self):
+        super().close()
+        self.flush()
+
+
+def _is_layout_table(name, attrs):
+    if name != 'table' or attrs.get('summary') != 'Layout table.':
+        return False
+    classes = attrs.get('class')
+    return classes is not None and (classes == 'ishade' or 'ishade' in classes.split())
+
+
+class StreamingParser:
+    """Fast parser that tokenizes each page once and only keeps the tables it needs."""
+    name = "stream"
+
+    def parse_year_page(self, html):
+        """Extract the storm links of each basin from the second layout table of a year page."""
+        (table,) = _ElementCapture([(_is_layout_table, 1)]).run(html)
+
+        if table is None:
+            print("Less than two tables found on the page.")
+            return None
+
+        header_row = next(table.descendants({'tr'}))
+        basins = [header.text.strip() for header in header_row.descendants({'td'})]
+
+        basin_links = {basin: [] for basin in basins}
+
+        rows = list(table.descendants({'tr'}))[1:]
+        for row in rows:
+            for index, cell in enumerate(row.descendants({'td'})):
+                for link in cell.descendants({'a'}):
+                    if 'href' in link.attrs:
+                        basin_links[basins[index]].append(link.attrs['href'])
+
+        return basin_links
+
+    def parse_storm_page(self, html):
+        """Extract the storm name and the rows of the fourth (track) table of a storm page."""
+        heading, table = _ElementCapture([
+            (lambda name, attrs: name == 'h1', 0),
+            (lambda name, attrs: name == 'table', 3)
+        ]).run(html)
+
+        typhoon_name = None
+        if heading is not None:
+            typhoon_name = "".join(text.strip() for text in heading.strings())
+
+        if table is None:
+            print("Less than four tables found on the page.")
+            return typhoon_name, None
+
+        rows = list(table.descendants({'tr'}))
+        table_data = [
+            [cell.text.strip() for cell in row.descendants({'td', 'th'})]
+            for row in rows[2:]
+        ]
+        return typhoon_name, table_data
+
+
+PARSERS = {
+    BeautifulSoupParser.name: BeautifulSoupParser(),
+    StreamingParser.name: StreamingParser()
+}
+
+
+def get_parser(name=None):
+    """Return the parser backend with the given name, or the default backend."""
+    name = name or DEFAULT_PARSER
+    if name not in PARSERS:
+        raise ValueError(f"Unknown parser backend: {name}. Available options are: {', '.join(PARSERS.keys())}")
+    return PARSERS[name]
+
+
+def _parse_with_fallback(method, html, backend):
+    parser = get_parser(backend)
+    try:
+        return getattr(parser, method)(html)
+    except Exception as e:
+        if parser is PARSERS[BeautifulSoupParser.name]:
+            raise
+        print(f"The {parser.name} parser failed ({e}). Falling back to BeautifulSoup.")
+        return getattr(PARSERS[BeautifulSoupParser.name], method)(html)
+
+
+def parse_year_page(html, backend=None):
+    """Parse a year page into {basin: [relative storm links]}, falling back to BeautifulSoup on errors."""
+    return _parse_with_fallback("parse_year_page", html, backend)
+
+
+def parse_storm_page(html, backend=None):
+    """Parse a storm page into (name, track rows), falling back to BeautifulSoup on errors."""
+    return _parse_with_fallback("parse_storm_page", html, backend)
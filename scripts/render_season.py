@@ -0,0 +1,272 @@
+import argparse
+import contextlib
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+# pygame greets on import on stdout, which may be carrying the video. Spawned workers inherit this.
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import pygame
+
+import stormchaser as sc
+import typhoon_scraper as ty
+from fixed_timestep import FixedTimestep, SIMULATION_STEP
+from map_cache import load_scaled_map
+from map_tiles import MapView
+from map_image_processor import MapImageProcessor
+from text_cache import TextLabel
+from cross_overlay import CrossOverlay
+from level_of_detail import detail_for_storm_count, DETAIL_FULL, DETAIL_NO_LABELS
+from typhoon_icon import BASIN_BOUNDARIES, draw_typhoons
+
+DEFAULT_FPS = 30
+
+
+def load_season(year, basin, folder_path="data"):
+    """
+    Load the storms of a basin-year the way the menu does, with tracks built and start times set.
+
+    Returns:
+        tuple: The typhoons and the earliest time across them, or (None, None) if there are no storms.
+    """
+    typhoons = ty.scrape_typhoon_data(year, basin.replace("_", " ").title(), folder_path)
+    if not typhoons:
+        return None, None
+
+    typhoons = sc.filter_typhoons_by_start_date(typhoons, datetime(year, 1, 1))
+    if not typhoons:
+        return None, None
+
+    earliest_time = sc.get_earliest_time(typhoons)
+    sc.set_typhoon_start_times(typhoons, earliest_time)
+    return typhoons, earliest_time
+
+
+class ImageSequenceWriter:
+    """Saves every frame as a numbered image in a folder."""
+
+    def __init__(self, folder, extension="png"):
+        os.makedirs(folder, exist_ok=True)
+        self.folder = folder
+        self.extension = extension
+
+    def write(self, frame, surface):
+        pygame.image.save(surface, os.path.join(self.folder, f"frame_{frame:06d}.{self.extension}"))
+
+    def close(self):
+        pass
+
+
+class RawVideoWriter:
+    """
+    Writes frames back to back as raw RGB24 bytes, e.g. to stdout piped into
+    `ffmpeg -f rawvideo -pix_fmt rgb24 -s WIDTHxHEIGHT -r FPS -i - video.mp4`.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, frame, surface):
+        self.stream.write(pygame.image.tobytes(surface, "RGB"))
+
+    def close(self):
+        self.stream.flush()
+
+
+class SeasonRenderer:
+    """
+    Renders the animation of a season without a window or a realtime clock. The simulation
+    advances by exactly one frame interval per frame, so the output only depends on the frame
+    rate and not on how fast frames are drawn.
+    """
+
+    def __init__(self, year, basin, width, height, fps=DEFAULT_FPS, playback_rate=1, folder_path="data"):
+        typhoons, self.earliest_time = load_season(year, basin, folder_path)
+        if not typhoons:
+            raise ValueError(f"No typhoon data available for {basin} in {year}.")
+
+        # The dummy video driver lets pygame create surfaces and fonts without a display
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        pygame.init()
+        self.surface = pygame.display.set_mode((width, height))
+
+        # Storms and landfalls are worked out on the animation window's map, which has the size of the land
+        # mask, and the view scales that map to fit the frame. Like the map, storms are letterboxed, not stretched,
+        # and centred with half of the margin on each side.
+        zoom = min(width / sc.SCREEN_WIDTH, height / sc.SCREEN_HEIGHT)
+        scaled_size = int(sc.SCREEN_WIDTH * zoom), int(sc.SCREEN_HEIGHT * zoom)
+        origin = (width - scaled_size[0]) // 2, (height - scaled_size[1]) // 2
+        self.view = MapView(width, height, sc.SCREEN_WIDTH, sc.SCREEN_HEIGHT)
+        self.view.zoom = zoom
+        self.view.offset_x = -origin[0] / zoom
+        self.view.offset_y = -origin[1] / zoom
+
+        reference_map = MapImageProcessor.load_land_mask(sc.get_resource_path(f"../resources/{basin}_simple_map.png"))
+        map_image = load_scaled_map(sc.get_resource_path(f"../resources/{basin}_detailed_map.png"), *scaled_size)
+        self.background = pygame.Surface((width, height)).convert()
+        self.background.fill((255, 255, 255))
+        self.background.blit(map_image, origin)
+        # Storms past the edge of the map are off screen in the window, so they are not drawn in the margin either
+        self.map_rect = map_image.get_rect(topleft=origin)
+
+        self.engine, self.typhoon_objects = sc.create_storms(typhoons, year, basin, reference_map,
+                                                             sc.SCREEN_WIDTH, sc.SCREEN_HEIGHT, folder_path)
+        self.time_label = TextLabel(pygame.font.SysFont(None, 30), (255, 255, 255))
+
+        self.fps = fps
+        self.frame_ms = 1000 * playback_rate / fps  # Animation time per frame
+        # Detail only depends on what is on screen, never on how long frames take, so the output is reproducible
+        self.max_detail = DETAIL_NO_LABELS if playback_rate >= sc.LOW_DETAIL_RATE else DETAIL_FULL
+        self.cross_overlay = CrossOverlay((width, height))
+        self.frame_count = int(self.engine.duration // self.frame_ms) + 1
+        self.frame = -1  # Last frame the simulation was advanced to
+        self.timestep = FixedTimestep()
+
+    def step(self):
+        """Advance the simulation to the next frame, in the same order the animation window does."""
+        if self.frame >= 0:
+            for _ in range(self.timestep.advance(1 / self.fps)):
+                self.engine.spin(SIMULATION_STEP)
+                for index in self.engine.visible:
+                    self.typhoon_objects[index].update_landfall_crosses(SIMULATION_STEP)
+            self.engine.interpolation = self.timestep.alpha
+        self.frame += 1
+
+        for index, lat, lon in self.engine.update(self.frame * self.frame_ms):
+            typhoon = self.typhoon_objects[index]
+            typhoon.add_landfall_cross(typhoon.latlon_to_screen(lat, lon))
+
+    def draw(self):
+        self.surface.blit(self.background, (0, 0))
+        detail = min(self.max_detail, detail_for_storm_count(len(self.engine.visible), self.view.zoom))
+        self.surface.set_clip(self.map_rect)
+        draw_typhoons(self.surface, [self.typhoon_objects[index] for index in self.engine.visible], self.cross_overlay, detail, self.view)
+        self.surface.set_clip(None)
+
+        elapsed_time = self.frame * self.frame_ms
+        current_play_time = self.earliest_time + timedelta(seconds=(elapsed_time / 1000) / sc.TIME_SCALE_FACTOR)
+        current_time_text = self.time_label.render(f"Current Time: {current_play_time.strftime('%Y-%m-%d %H:%M')}")
+        # On the map, so the white text is never drawn on the white margin
+        self.surface.blit(current_time_text, (self.map_rect.right - current_time_text.get_width() - 10,
+                                              self.map_rect.bottom - current_time_text.get_height() - 10))
+
+    def render(self, writer, first_frame=0, end_frame=None):
+        """Render frames [first_frame, end_frame) to the writer."""
+        end_frame = self.frame_count if end_frame is None else min(end_frame, self.frame_count)
+
+        # Crosses and blade angles depend on every earlier frame, so a range starting
+        # mid-season simulates its way there first. Without drawing this is cheap.
+        while self.frame < first_frame - 1:
+            self.step()
+
+        while self.frame < end_frame - 1:
+            self.step()
+            self.draw()
+            writer.write(self.frame, self.surface)
+        writer.close()
+
+
+def render_part(year, basin, width, height, fps, playback_rate, first_frame, end_frame, frames_dir, raw_path, folder_path):
+    """Render one range of frames in a worker process, to the frames folder or a raw part file."""
+    # Console output must never end up in a video piped through stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        renderer = SeasonRenderer(year, basin, width, height, fps, playback_rate, folder_path)
+        if frames_dir:
+            renderer.render(ImageSequenceWriter(frames_dir), first_frame, end_frame)
+        else:
+            with open(raw_path, "wb") as file:
+                renderer.render(RawVideoWriter(file), first_frame, end_frame)
+
+
+def render_season(year, basin, width, height, fps=DEFAULT_FPS, playback_rate=1, frames_dir=None, raw_stream=None, workers=1,
+                  folder_path="data"):
+    """
+    Render a whole season to an image sequence or a raw video stream.
+
+    With more than one worker the season is split into consecutive frame ranges that are
+    rendered in separate processes. Image sequences are written straight to the folder and
+    raw parts are appended to the stream in order as they finish.
+
+    Returns:
+        int: The number of frames rendered.
+    """
+    renderer = SeasonRenderer(year, basin, width, height, fps, playback_rate, folder_path)
+    frame_count = renderer.frame_count
+
+    if workers <= 1:
+        writer = ImageSequenceWriter(frames_dir) if frames_dir else RawVideoWriter(raw_stream)
+        renderer.render(writer)
+        return frame_count
+
+    bounds = [frame_count * part // workers for part in range(workers + 1)]
+    # Spawned workers start from a clean pygame instead of a forked copy of this one
+    with tempfile.TemporaryDirectory() as temp_dir, \
+            ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = []
+        for part in range(workers):
+            raw_path = None if frames_dir else os.path.join(temp_dir, f"part_{part}.rgb")
+            future = executor.submit(render_part, year, basin, width, height, fps, playback_rate,
+                                     bounds[part], bounds[part + 1], frames_dir, raw_path, folder_path)
+            futures.append((future, raw_path))
+
+        for future, raw_path in futures:
+            future.result()
+            if raw_path:
+                with open(raw_path, "rb") as file:
+                    shutil.copyfileobj(file, raw_stream)
+                os.remove(raw_path)
+        if raw_stream:
+            raw_stream.flush()
+    return frame_count
+
+
+def parse_size(text):
+    try:
+        width, height = (int(value) for value in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid size: {text}. Expected WIDTHxHEIGHT, e.g. 1200x900.")
+    return width, height
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the animation of a season without a display.")
+    parser.add_argument("year", type=int, help="Year of the season.")
+    parser.add_argument("basin", choices=sorted(BASIN_BOUNDARIES), help="Basin to render.")
+    parser.add_argument("--size", type=parse_size, default=(sc.SCREEN_WIDTH, sc.SCREEN_HEIGHT),
+                        help="Frame size as WIDTHxHEIGHT. Defaults to the window size.")
+    parser.add_argument("--fps", type=int, default=DEFAULT_FPS, help="Frames per second of animation time.")
+    parser.add_argument("--rate", type=float, default=1,
+                        help="Playback rate, as a multiple of the animation window's 12 hours per second.")
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument("--frames-dir", help="Folder to save the frames to as numbered PNG images.")
+    output.add_argument("--raw", help="File to write raw RGB24 frames to, or - for stdout.")
+    parser.add_argument("--workers", type=int, default=1, help="Number of processes rendering parts of the season.")
+    parser.add_argument("--folder", default="data", help="Typhoon data cache folder.")
+    args = parser.parse_args()
+    if args.rate <= 0:
+        parser.error("--rate must be positive.")
+
+    width, height = args.size
+    start = time.perf_counter()
+    # Progress goes to stderr so stdout can carry the video
+    with contextlib.redirect_stdout(sys.stderr), contextlib.ExitStack() as stack:
+        if args.raw == "-":
+            raw_stream = sys.__stdout__.buffer
+        elif args.raw:
+            raw_stream = stack.enter_context(open(args.raw, "wb"))
+        else:
+            raw_stream = None
+
+        frame_count = render_season(args.year, args.basin, width, height, args.fps, args.rate,
+                                    args.frames_dir, raw_stream, args.workers, args.folder)
+        elapsed = time.perf_counter() - start
+        print(f"Rendered {frame_count} frames of {width}x{height} in {elapsed:.1f} s ({frame_count / elapsed:.1f} frames/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+from collections import OrderedDict
+
+DEFAULT_MEMORY_CAP = 64 * 1024 * 1024  # bytes
+
+
+def quantize(value, step, maximum=255):
+    """Snap a value to the nearest multiple of step, clamped to [0, maximum]."""
+    return min(max(int(round(value / step) * step), 0), maximum)
+
+
+def surface_size(surface):
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+
+class SpriteCache:
+    """
+    Least-recently-used cache of pygame surfaces with a memory cap.
+
+    Surfaces are created on demand by the factory passed to get(). Once the total size of the
+    cached surfaces exceeds the cap, the least recently used ones are dropped.
+    """
+
+    def __init__(self, memory_cap=DEFAULT_MEMORY_CAP):
+        self.memory_cap = memory_cap
+        self.surfaces = OrderedDict()
+        self.memory_used = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, factory):
+        """Return the surface cached under key, creating it with factory() if it is missing."""
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = factory()
+        self.surfaces[key] = surface
+        self.memory_used += surface_size(surface)
+        while self.memory_used > self.memory_cap and len(self.surfaces) > 1:
+            _, evicted = self.surfaces.popitem(last=False)
+            self.memory_used -= surface_size(evicted)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+        self.memory_used = 0
+
+    def __len__(self):
+        return len(self.surfaces)
@@ -0,0 +1,288 @@
+import heapq
+
+import numpy as np
+
+BLEND_SPEED = 4
+
+
+class StormIntervals:
+    """
+    Lifetimes of a set of storms, sorted by start time, to find the storms alive at any time.
+
+    No storm lives longer than the longest lifetime, so the storms alive at a time all start
+    within that long before it. Two binary searches find those storms and only they are checked,
+    which takes O(log n + k) for typhoon seasons where no lifetime is much longer than the rest.
+    """
+
+    def __init__(self, starts, ends):
+        self.storm_ends = ends
+        self.order = np.argsort(starts, kind='stable')
+        self.starts = starts[self.order]
+        self.ends = ends[self.order]
+        self.longest = float((ends - starts).max(initial=0))
+
+    def alive_at(self, time):
+        """Indices, in ascending order, of the storms with start <= time <= end."""
+        first = np.searchsorted(self.starts, time - self.longest, side='left')
+        last = np.searchsorted(self.starts, time, side='right')
+        candidates = self.order[first:last]
+        return np.sort(candidates[self.ends[first:last] >= time])
+
+
+class StormSchedule(StormIntervals):
+    """
+    Storms alive at the current time, kept up to date as time moves forward.
+
+    Storms wait in start order until their start time comes, then move into an active set
+    ordered by end time, and leave it once they have faded out. Moving forward costs
+    O(log n) plus the storms that start or end, so a frame with nothing changing only
+    touches the storms on screen. Going back in time rebuilds the active set with alive_at().
+    """
+
+    def __init__(self, starts, ends):
+        super().__init__(starts, ends)
+        self.time = None
+        self.next_start = 0  # Position in start order of the first storm that has not started yet
+        self.active = []  # Heap of (end, storm index)
+        self.indices = np.zeros(0, dtype=np.int64)
+
+    def advance(self, time):
+        """Move to `time` and return the indices, in ascending order, of the storms alive then."""
+        changed = False
+        if self.time is None or time < self.time:
+            self.next_start = int(np.searchsorted(self.starts, time, side='right'))
+            alive = self.alive_at(time)
+            self.active = list(zip(self.storm_ends[alive].tolist(), alive.tolist()))
+            heapq.heapify(self.active)
+            changed = True
+        else:
+            # Start the storms whose time has come, skipping any that already ended if time jumped ahead
+            last = int(np.searchsorted(self.starts, time, side='right'))
+            if last > self.next_start:
+                starting = self.order[self.next_start:last][self.ends[self.next_start:last] >= time]
+                for end, index in zip(self.storm_ends[starting].tolist(), starting.tolist()):
+                    heapq.heappush(self.active, (end, index))
+                self.next_start = last
+                changed = True
+            # Retire the storms that have faded out
+            while self.active and self.active[0][0] < time:
+                heapq.heappop(self.active)
+                changed = True
+
+        self.time = time
+        if changed:
+            self.indices = np.array(sorted(index for _, index in self.active), dtype=np.int64)
+        return self.indices
+
+
+class StormEngine:
+    """
+    Animation state of every storm in a season, stored as one NumPy array per field.
+
+    Track points of all storms are concatenated, and offsets[i] is the index of storm i's
+    first point. Position, color and alpha are a pure function of the elapsed animation time:
+    update() finds every storm's current segment with one binary search over the segment
+    times and interpolates along it, so skipping ahead costs the same as a normal frame and
+    the result does not depend on the frame rate. Typhoon objects read the state when drawing.
+    """
+
+    def __init__(self, tracks, start_times, category_colors, time_scale_factor, landfall_events=None,
+                 fade_in_duration=1, fade_out_duration=0.5):
+        self.tracks = tracks
+        self.time_scale_factor = time_scale_factor
+        self.fade_in_duration = fade_in_duration
+        self.fade_out_duration = fade_out_duration
+        count = len(tracks)
+
+        # Track points of every storm
+        lengths = np.array([len(track) for track in tracks], dtype=np.int64)
+        self.offsets = np.cumsum(lengths) - lengths
+        self.last_points = self.offsets + lengths - 1
+        self.point_lats = np.array([position['lat'] for track in tracks for position in track.positions], dtype=float)
+        self.point_longs = np.array([position['long'] for track in tracks for position in track.positions], dtype=float)
+        point_classes = np.array([track_class for track in tracks for track_class in track.classes], dtype=np.int64)
+        # Some random normalizing formula that changes the typhooon's rotation speed based on its strength
+        self.point_spin_rates = 1.5 + (np.power(1 + point_classes, 1.7) / 8)
+
+        # Animation time in ms of each point, counted from its storm's arrival. Times that go
+        # backwards in the source data are clamped so every storm's times are sorted.
+        self.point_times = np.zeros(len(self.point_lats))
+        for track, offset in zip(tracks, self.offsets.tolist()):
+            track_times = (np.array(track.times, dtype=float) - track.start_time) * time_scale_factor * 1000
+            self.point_times[offset:offset + len(track)] = np.maximum.accumulate(track_times)
+        self.track_durations = self.point_times[self.last_points]
+        # Shift every storm's times into a range of its own, so a single sorted array can be searched for all storms
+        self.time_span = float(self.track_durations.max(initial=0)) + 1
+        self.search_keys = np.repeat(np.arange(count), lengths) * self.time_span + self.point_times
+
+        # Color of the point each segment heads to, and the color a storm has blended to on reaching each point.
+        # The color approaches the target exponentially, which is what blending a little every frame converges to.
+        next_points = np.minimum(np.arange(len(self.point_lats)) + 1, np.repeat(self.last_points, lengths))
+        point_colors = np.array(
+            [category_colors.get(track_class, (0, 0, 0)) for track_class in point_classes.tolist()], dtype=float
+        ).reshape(-1, 3)
+        self.segment_end_colors = point_colors[next_points]
+        self.point_blended_colors = np.zeros_like(point_colors)  # Start from black
+        decays = np.exp(-BLEND_SPEED * (self.point_times[next_points] - self.point_times) / 1000)
+        for start, end in zip(self.offsets.tolist(), self.last_points.tolist()):
+            for point in range(start, end):
+                target = self.segment_end_colors[point]
+                self.point_blended_colors[point + 1] = target + (self.point_blended_colors[point] - target) * decays[point]
+
+        # Alpha each storm has faded in to when it reaches the end of its track
+        self.end_alphas = np.minimum(self.track_durations / 1000 * (255 / fade_in_duration), 255)
+
+        # When each storm arrives and when it has faded out after its track, in ms of animation time
+        self.start_times = np.array(start_times, dtype=float)
+        self.end_times = self.start_times + self.track_durations + self.end_alphas / 255 * fade_out_duration * 1000
+        self.schedule = StormSchedule(self.start_times, self.end_times)
+        self.visible = np.zeros(0, dtype=np.int64)  # Storms on screen after the last update
+
+        # Per storm state
+        self.elapsed_time = None
+        self.steps = np.zeros(count, dtype=np.int64)
+        self.fractions = np.zeros(count)  # How far along the current segment each storm is
+        self.lats = self.point_lats[self.offsets]
+        self.longs = self.point_longs[self.offsets]
+        self.alphas = np.zeros(count)
+        self.colors = np.zeros((count, 3), dtype=np.int64)
+        self.color_alphas = np.zeros(count, dtype=np.int64)
+        self.blade_angles = np.zeros(count)
+        self.previous_blade_angles = np.zeros(count)  # Angles one simulation step earlier
+        self.interpolation = 1.0  # How far from the previous to the current angles storms are drawn
+
+        self.set_landfall_events(landfall_events or [None] * count)
+
+    def set_landfall_events(self, landfall_events):
+        """Flatten each storm's precomputed landfall events (see landfall_events.py), in track order."""
+        events = [(index, event) for index, storm_events in enumerate(landfall_events) for event in storm_events or []]
+        event_storms = np.array([index for index, _ in events], dtype=np.int64)
+        event_points = self.offsets[event_storms] + np.array([event['step'] for _, event in events], dtype=np.int64)
+        next_points = np.minimum(event_points + 1, self.last_points[event_storms])
+        fractions = np.array([event['fraction'] for _, event in events], dtype=float)
+        # Animation time, from its storm's arrival, at which each landfall is reached
+        event_times = self.point_times[event_points] + (self.point_times[next_points] - self.point_times[event_points]) * fractions
+        self.event_search_keys = event_storms * self.time_span + event_times
+        self.event_lats = [event['lat'] for _, event in events]
+        self.event_longs = [event['long'] for _, event in events]
+
+        self.event_times = event_times
+        self.event_ends = np.cumsum(np.bincount(event_storms, minlength=len(self.tracks))).astype(np.int64)
+        self.next_events = np.zeros(len(self.tracks), dtype=np.int64)
+        self.next_event_times = np.full(len(self.tracks), np.inf)
+        self.seek_landfalls(np.full(len(self.tracks), -1.0))
+
+    def seek_landfalls(self, track_times):
+        """
+        Point each storm at its first landfall after `track_times`, without reporting the ones before it.
+        A track time of -1 means the storm has not arrived yet.
+        """
+        storm_keys = np.arange(len(self)) * self.time_span + track_times
+        self.next_events = np.searchsorted(self.event_search_keys, storm_keys, side='right')
+        self.load_next_events(np.arange(len(self)))
+
+    def passed_landfalls(self, index):
+        """(lat, long) of every landfall a storm has passed, in track order."""
+        first_event = int(self.event_ends[index - 1]) if index else 0
+        next_event = int(self.next_events[index])
+        return list(zip(self.event_lats[first_event:next_event], self.event_longs[first_event:next_event]))
+
+    def load_next_events(self, indices):
+        has_event = self.next_events[indices] < self.event_ends[indices]
+        self.next_event_times[indices] = np.inf
+        self.next_event_times[indices[has_event]] = self.event_times[self.next_events[indices[has_event]]]
+
+    def __len__(self):
+        return len(self.tracks)
+
+    @property
+    def duration(self):
+        """Time in ms until the last storm has faded out."""
+        return float(self.end_times.max(initial=0))
+
+    def update(self, elapsed_time, replay_landfalls=True):
+        """
+        Set every storm on screen to its state `elapsed_time` ms into the animation.
+        Storms that have not arrived yet or have faded out are not touched.
+
+        Returns:
+            list: (storm index, lat, long) of every landfall of a storm on screen passed since
+            the previous update. After going back in time, the landfalls passed so far are
+            reported again, so crosses from before the jump should be cleared. With
+            `replay_landfalls` off they are not, and passed_landfalls() tells which remain.
+        """
+        if self.elapsed_time is not None and elapsed_time < self.elapsed_time:
+            if replay_landfalls:
+                self.seek_landfalls(np.full(len(self), -1.0))
+            else:
+                local_times = elapsed_time - self.start_times
+                self.seek_landfalls(np.where(local_times < 0, -1.0, np.minimum(local_times, self.track_durations)))
+
+        indices = self.schedule.advance(elapsed_time)
+        if indices is not self.visible:
+            # Storms that went off screen since the last update are hidden
+            hidden = np.setdiff1d(self.visible, indices, assume_unique=True)
+            self.alphas[hidden] = 0
+            self.color_alphas[hidden] = 0
+            self.visible = indices
+        self.elapsed_time = elapsed_time
+
+        local_times = elapsed_time - self.start_times[indices]
+        track_durations = self.track_durations[indices]
+        track_times = np.clip(local_times, 0, track_durations)
+
+        # Segment of each storm: the last track point at or before its track time
+        points = np.searchsorted(self.search_keys, indices * self.time_span + track_times, side='right') - 1
+        finished = points >= self.last_points[indices]
+        next_points = np.where(finished, points, points + 1)
+        elapsed_in_segment = track_times - self.point_times[points]
+        segment_times = self.point_times[next_points] - self.point_times[points]
+        fractions = np.where(finished, 0.0, elapsed_in_segment / np.where(finished, 1, segment_times))
+        self.fractions[indices] = fractions
+        self.steps[indices] = points - self.offsets[indices]
+
+        self.lats[indices] = self.point_lats[points] + (self.point_lats[next_points] - self.point_lats[points]) * fractions
+        self.longs[indices] = self.point_longs[points] + (self.point_longs[next_points] - self.point_longs[points]) * fractions
+
+        # Blend from the color reached at the start of the segment towards the color of the point ahead
+        targets = self.segment_end_colors[points]
+        decays = np.exp(-BLEND_SPEED * elapsed_in_segment / 1000)[:, None]
+        self.colors[indices] = (targets + (self.point_blended_colors[points] - targets) * decays).astype(np.int64)
+
+        # Fade in on arrival, then fade out from wherever the fade in got to once the track is over
+        fade_in = np.clip(local_times / 1000 * (255 / self.fade_in_duration), 0, 255)
+        fade_out = self.end_alphas[indices] - (local_times - track_durations) / 1000 * (255 / self.fade_out_duration)
+        alphas = np.where(local_times > track_durations, np.maximum(fade_out, 0), fade_in)
+        self.alphas[indices] = alphas
+        self.color_alphas[indices] = alphas.astype(np.int64)
+
+        return self.reached_landfalls(indices, local_times)
+
+    def reached_landfalls(self, indices, local_times):
+        reached = []
+        while True:
+            due = self.next_event_times[indices] <= local_times
+            if not due.any():
+                return reached
+            indices, local_times = indices[due], local_times[due]
+            reached.extend(
+                (int(index), self.event_lats[event], self.event_longs[event])
+                for index, event in zip(indices, self.next_events[indices])
+            )
+            self.next_events[indices] += 1
+            self.load_next_events(indices)
+
+    def is_active(self, index):
+        """Whether a storm has not faded out yet at the last update."""
+        return self.elapsed_time is None or bool(self.elapsed_time <= self.end_times[index])
+
+    def spin(self, dt):
+        """Turn the blades of every visible storm by one simulation step. Stronger storms spin faster."""
+        self.previous_blade_angles[self.visible] = self.blade_angles[self.visible]
+        indices = self.visible[self.alphas[self.visible] > 0]
+        self.blade_angles[indices] += self.point_spin_rates[self.offsets[indices] + self.steps[indices]] * dt * 100
+
+    def blade_angle(self, index):
+        """Angle to draw a storm's blades at, between its last two simulation steps."""
+        previous = self.previous_blade_angles[index]
+        return float(previous + (self.blade_angles[index] - previous) * self.interpolation)
@@ -1,10 +1,20 @@
 import pygame
-import typhoon_scraper as ty
 from datetime import datetime, timedelta
 import map_maker as mapmaker
 from map_image_processor import MapImageProcessor
-from typhoon_icon import Typhoon
-from buttons import Button, ToggleableButton
+from typhoon_icon import Typhoon, BASIN_BOUNDARIES, draw_typhoons
+from cross_overlay import CrossOverlay
+from level_of_detail import FrameBudgetGovernor, detail_for_storm_count, DETAIL_NO_LABELS
+from storm_engine import StormEngine
+from landfall_events import attach_landfall_events
+from track_model import to_timestamp, to_datetime
+from buttons import Button, ToggleableButton, TimelineSlider
+from dirty_renderer import FullRenderer, DirtyRectRenderer
+from fixed_timestep import FixedTimestep, SIMULATION_STEP
+from map_tiles import MapView, TiledMap, load_tile_pyramid, ZOOM_STEP
+from map_cache import ScaledMapCache, fit_size
+from text_cache import TextLabel
+import text_cache
 import threading
 import os
 import sys
@@ -27,7 +37,16 @@ typhoons = None
 earliest_time = None
 loading = False  # Flag to control the loading screen
 TIME_SCALE_FACTOR = 1 / (12 * 60 * 60)  # 1 second per 12 hours in real-time 
+DAY_MS = 24 * 60 * 60 * 1000 * TIME_SCALE_FACTOR  # Animation milliseconds per day
+WEEK_MS = 7 * DAY_MS
 SCREEN_WIDTH, SCREEN_HEIGHT = 1200, 900
+FPS_REFRESH_INTERVAL = 250  # Milliseconds between updates of the FPS readout
+TARGET_FPS = int(os.getenv("STORMCHASER_FPS", "60"))  # Frame rate cap of the animation window, 0 for uncapped
+USE_VSYNC = os.getenv("STORMCHASER_VSYNC", "0") == "1"  # Let the display pace frames instead of the cap
+PLAYBACK_RATES = [-16, 1, 4, 16, 64]  # Multipliers of TIME_SCALE_FACTOR, negative ones play backwards
+LOW_DETAIL_RATE = 16  # From this playback rate on storms are drawn without labels
+DEFAULT_TARGET_FPS = 60  # Frame rate the level of detail is held to when the frame rate is not capped
+EXIT_AFTER_FIRST_FRAME = os.getenv("STORMCHASER_EXIT_AFTER_FIRST_FRAME", "0") == "1"  # Used by benchmark_startup.py
 # Using get_resource_path to load the image from the resources folder
 reference_map = None
 BASIN_ABBREVIATIONS = {
@@ -58,65 +77,82 @@ def initialize_dataset(screen, screen_width, screen_height, start_date, selected
 
     # Start scraping typhoon data in a background thread
     def scrape_data():
-        global typhoons
-        typhoons = ty.scrape_typhoon_data(start_date.year, basin_name)
-        
-        # Filter typhoons by start date after scraping is done
-        if start_date:
-            typhoons = filter_typhoons_by_start_date(typhoons, start_date)
+        global typhoons, earliest_time, loading
+        try:
+            # The scraper and its HTTP and HTML parsing libraries are only needed from here on
+            import typhoon_scraper as ty
+
+            # Every track is parsed once while loading so the animation never has to
+            typhoons = ty.scrape_typhoon_data(start_date.year, basin_name)
+            if not typhoons:
+                print(f"No typhoon data available for {basin_name} in {start_date.year}.")
+                typhoons = []
+                return
 
-        if not typhoons:
-            print(f"No typhoons found starting after {start_date}.")
-            return
+            # Filter typhoons by start date after scraping is done
+            if start_date:
+                typhoons = filter_typhoons_by_start_date(typhoons, start_date)
 
-        # Calculate the earliest time across all typhoons
-        global earliest_time
-        earliest_time = get_earliest_time(typhoons)
+            if not typhoons:
+                print(f"No typhoons found starting after {start_date}.")
+                return
 
-        # Set start times for each typhoon relative to the earliest time
-        set_typhoon_start_times(typhoons, earliest_time)
-        
-        # Mark loading as complete
-        global loading
-        loading = False
+            # Calculate the earliest time across all typhoons
+            earliest_time = get_earliest_time(typhoons)
+
+            # Set start times for each typhoon relative to the earliest time
+            set_typhoon_start_times(typhoons, earliest_time)
+        finally:
+            # Mark loading as complete, also when there is nothing to show, so the loading screen never waits forever
+            loading = False
 
     # Create and start the scraping thread
     scrape_thread = threading.Thread(target=scrape_data)
     scrape_thread.start()
 
     # While the scraping is running, show a loading screen
+    font = pygame.font.SysFont("Arial", 24)
     while loading:
         screen.fill((0, 0, 0))  # Clear screen with black
-        font = pygame.font.SysFont("Arial", 24)
         loading_text = font.render("Loading typhoon data...", True, (255, 255, 255))
         screen.blit(loading_text, (screen_width // 2 - loading_text.get_width() // 2, screen_height // 2 - loading_text.get_height() // 2))
         pygame.display.update()  # Update the screen
         time.sleep(0.1)  # Delay for a short time to prevent 100% CPU usage
 
+    # Tell the user before going back to the menu when the season has no storms to show
+    if not typhoons:
+        screen.fill((0, 0, 0))
+        message_text = font.render(f"No storms found for {basin_name} in {start_date.year}.", True, (255, 255, 255))
+        screen.blit(message_text, (screen_width // 2 - message_text.get_width() // 2, screen_height // 2 - message_text.get_height() // 2))
+        pygame.display.update()
+        pygame.time.wait(2000)
+        return typhoons
+
     # After scraping is done, proceed with the next steps
     print("Data scraping complete!")
     return typhoons
 
 # Function to filter typhoons based on the start date
 def filter_typhoons_by_start_date(typhoons, start_date):
+    start_timestamp = to_timestamp(start_date)
     return [
         typhoon for typhoon in typhoons
-        if datetime.strptime(typhoon['path'][0]['time'], '%Y-%m-%d %H:%M') >= start_date
+        if typhoon['track'].start_time >= start_timestamp
     ]
 
 # Function to get the earliest time from all typhoons
 def get_earliest_time(typhoons):
-    return min(
-        datetime.strptime(point['time'], '%Y-%m-%d %H:%M')
+    return to_datetime(min(
+        min(typhoon['track'].times)
         for typhoon in typhoons
-        for point in typhoon['path']
-    )
+    ))
 
 # Function to set start times for each typhoon relative to the earliest time
 def set_typhoon_start_times(typhoons, earliest_time):
+    earliest_timestamp = to_timestamp(earliest_time)
     for typhoon in typhoons:
-        first_time = datetime.strptime(typhoon['path'][0]['time'], '%Y-%m-%d %H:%M')
-        typhoon['start_time'] = int(((first_time - earliest_time).total_seconds() * TIME_SCALE_FACTOR) * 1000)
+        first_time = typhoon['track'].start_time
+        typhoon['start_time'] = int(((first_time - earliest_timestamp) * TIME_SCALE_FACTOR) * 1000)
         print(typhoon['name'], typhoon['start_time'])
 
 
@@ -169,7 +205,9 @@ def initialize_input_ui(screen, screen_width, screen_height):
     button_font = pygame.font.SysFont("Impact", 15)  # Font for buttons
     clock = pygame.time.Clock()
     current_map = None
-    map_image = pygame.image.load(mapmaker.get_detailed_map_image()).convert()
+    map_image = None
+    # Maps already scaled to the window, read from raw files instead of decoding the full-size PNGs
+    map_cache = ScaledMapCache(screen_width, screen_height)
 
     def get_map_image(next_map):
         nonlocal map_image, current_map
@@ -177,16 +215,7 @@ def initialize_input_ui(screen, screen_width, screen_height):
         if current_map == next_map:
             return map_image
         
-        map_image = pygame.image.load(mapmaker.get_detailed_map_image(next_map)).convert()
-        map_width, map_height = map_image.get_size()
-        aspect_ratio = map_width / map_height
-        new_width = screen_width
-        new_height = int(new_width / aspect_ratio)
-
-        if new_height > screen_height:
-            new_height = screen_height
-            new_width = int(new_height * aspect_ratio)
-        map_image = pygame.transform.scale(map_image, (new_width, new_height))
+        map_image = map_cache.get(mapmaker.get_detailed_map_image(next_map))
         current_map = next_map
         return map_image
 
@@ -227,6 +256,7 @@ def initialize_input_ui(screen, screen_width, screen_height):
     button_active_color = pygame.Color("lawngreen")
     button_inactive_color = pygame.Color("lightgreen")
     done = False
+    first_frame = True
 
     while not done:
         for event in pygame.event.get():
@@ -275,6 +305,13 @@ def initialize_input_ui(screen, screen_width, screen_height):
         screen.blit(submit_text_surface, (300 - submit_text.get_width() // 2, 400))
 
         pygame.display.flip()
+        if first_frame:
+            first_frame = False
+            if EXIT_AFTER_FIRST_FRAME:
+                pygame.quit()
+                sys.exit(0)
+            # The maps of the other basins are loaded in the background once the menu is up, so switching basins is instant
+            map_cache.preload([mapmaker.map_output_path(button["code"].replace("_", " ").title()) for button in buttons if not button["active"]])
         clock.tick(30)
 
     selected_basin = next((button["code"] for button in buttons if button["active"]), None)
@@ -331,43 +368,64 @@ def parse_start_date(input_boxes):
 ###########################
 # Main Animation Function #
 ###########################
+def playback_rate_text(playback_rate):
+    return f"<< {-playback_rate}x" if playback_rate < 0 else f"{playback_rate}x"
+
+def create_animation_window():
+    flags = pygame.HWSURFACE | pygame.DOUBLEBUF
+    if USE_VSYNC:
+        # VSync needs a renderer, which SCALED sets up
+        try:
+            return pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), flags | pygame.SCALED, vsync=1)
+        except pygame.error as e:
+            print(f"VSync is not available, falling back to the frame rate cap: {e}")
+    return pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), flags)
+
+def create_storms(typhoons, year, basin, reference_map, width, height, folder_path="data"):
+    """Build the engine holding the animation state of every storm, and a Typhoon view of each one for drawing."""
+    # Work out every landfall up front so they do not depend on the frame rate
+    attach_landfall_events(typhoons, year, basin.replace("_", " ").title(), reference_map,
+                           BASIN_BOUNDARIES[basin], width, height, folder_path)
+
+    engine = StormEngine(
+        [typhoon['track'] for typhoon in typhoons], [typhoon['start_time'] for typhoon in typhoons],
+        category_colors, TIME_SCALE_FACTOR, [typhoon.get('landfall_events') for typhoon in typhoons]
+    )
+    typhoon_objects = [
+        Typhoon(typhoon['name'], engine, index, width, height, basin)
+        for index, typhoon in enumerate(typhoons)
+    ]
+    return engine, typhoon_objects
+
 def animate_typhoons(year, basin):
     # Initialize Pygame
     pygame.init()
-    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.HWSURFACE | pygame.DOUBLEBUF)
+    screen = create_animation_window()
     pygame.display.set_caption("PROJECT STORMCHASER")
 
+    # Fonts and text rendered before pygame was last quit cannot be reused
+    Typhoon.label_font = None
+    text_cache.clear()
+
     # Generate file paths for the maps dynamically based on the basin parameter
     detailed_map_filename = f"../resources/{basin}_detailed_map.png"
     simple_map_filename = f"../resources/{basin}_simple_map.png"
 
-    # Load reference map and detailed map
-    reference_map = MapImageProcessor.load_image(get_resource_path(simple_map_filename))
-    map_image = pygame.image.load(get_resource_path(detailed_map_filename)).convert()
-
-    # Scale the map to fit the window size while maintaining the aspect ratio
-    map_width, map_height = map_image.get_size()
-    aspect_ratio = map_width / map_height
-    new_width = SCREEN_WIDTH
-    new_height = int(new_width / aspect_ratio)
-
-    if new_height > SCREEN_HEIGHT:
-        new_height = SCREEN_HEIGHT
-        new_width = int(new_height * aspect_ratio)
-    map_image = pygame.transform.scale(map_image, (new_width, new_height))
+    # Load the land mask of the reference map, and the tile pyramid of the detailed map,
+    # of which only the tiles in view are loaded
+    reference_map = MapImageProcessor.load_land_mask(get_resource_path(simple_map_filename))
+    map_pyramid = load_tile_pyramid(get_resource_path(detailed_map_filename))
 
     clock = pygame.time.Clock()
-    
-    # Create Typhoon objects
-    typhoon_objects = [
-        Typhoon(typhoon['name'], typhoon['path'], typhoon['start_time'], category_colors, SCREEN_WIDTH, SCREEN_HEIGHT, TIME_SCALE_FACTOR, reference_map, basin)
-        for typhoon in typhoons
-    ]
+    # Frame rate cap. With vsync on the display already waits for each refresh.
+    frame_rate_cap = 0 if USE_VSYNC else TARGET_FPS
+    # Blade spin and cross animations advance in fixed steps, so they look the same at any frame rate
+    timestep = FixedTimestep()
+    engine, typhoon_objects = create_storms(typhoons, year, basin, reference_map, SCREEN_WIDTH, SCREEN_HEIGHT)
 
     running = True
-    start_ticks = pygame.time.get_ticks()
     elapsed_time = 0
-    skip_time = 0
+    playback_rate = 1
 
     # Create buttons
     font = pygame.font.SysFont(None, 30)
@@ -389,23 +447,63 @@ def animate_typhoons(year, basin):
     back_button_x = skip_button_x + skip_button_width + 10
     back_button_y = play_button_y
 
+    # Playback rate button positioning
+    rate_button_width = 110
+    rate_button_x = back_button_x + back_button_width + 10
+    rate_button_y = play_button_y
+
     # Initialize buttons
     play_button = ToggleableButton("PLAY", play_button_x, play_button_y, play_button_width, button_height, font, (70, 130, 180), (255, 255, 255), is_playing=False)
     skip_button = Button(">> 1 WEEK", skip_button_x, skip_button_y, skip_button_width, button_height, font, (70, 130, 180), (255, 255, 255))
     back_button = Button("BACK TO MENU", back_button_x, back_button_y, back_button_width, button_height, font, (200, 50, 50), (255, 255, 255))
+    rate_button = Button(playback_rate_text(playback_rate), rate_button_x, rate_button_y, rate_button_width, button_height, font, (70, 130, 180), (255, 255, 255))
+
+    # Timeline slider along the bottom, left of the current time readout
+    timeline_slider = TimelineSlider(10, screen_height - 25, screen_width - 380, 8, (200, 200, 200), (70, 130, 180), (255, 255, 255))
+    timeline_duration = max(engine.duration, 1)
 
     formatted_time = earliest_time.strftime('%Y-%m-%d %H:%M')
+    fps_label = TextLabel(font, (255, 255, 255))
+    time_label = TextLabel(font, (255, 255, 255))
+    fps_text = "FPS: 0.00"
+    fps_updated_at = 0
+
+    # The map view is zoomed with the mouse wheel and panned by dragging with the right mouse button
+    view = MapView(screen_width, screen_height, *fit_size(map_pyramid.width, map_pyramid.height, SCREEN_WIDTH, SCREEN_HEIGHT))
+    tiled_map = TiledMap(map_pyramid, view)
+    panning = False
+
+    # The map only changes when the view does, so it is composed then and otherwise only copied
+    # to the screen. With dirty rects on, only the parts of it that were drawn over are restored each frame.
+    background = pygame.Surface(screen.get_size()).convert()
+    background.fill((255, 255, 255))
+    tiled_map.draw(background)
+    view_state = view.state
+    use_dirty_rects = os.getenv("STORMCHASER_DIRTY_RECTS", "0") == "1"
+    renderer = DirtyRectRenderer(screen, background) if use_dirty_rects else FullRenderer(screen, background)
+    cross_overlay = CrossOverlay(screen.get_size())
+    # Lowers the level of detail of storms when frames take longer than the target frame rate allows
+    governor = FrameBudgetGovernor(TARGET_FPS or DEFAULT_TARGET_FPS)
     
     while running:
-        screen.fill((255, 255, 255))
-        screen.blit(map_image, (0, 0))  # Draw the map once
-        play_button.draw(screen)
-        skip_button.draw(screen)
-        back_button.draw(screen)
+        # Recompose the map from its tiles when the view was zoomed or panned last frame
+        if view.state != view_state:
+            background.fill((255, 255, 255))
+            tiled_map.draw(background)
+            view_state = view.state
+            renderer.invalidate()
+
+        renderer.begin_frame()
+        renderer.add(play_button.draw(screen))
+        renderer.add(skip_button.draw(screen))
+        renderer.add(back_button.draw(screen))
+        renderer.add(rate_button.draw(screen))
         
-        fps = clock.get_fps()
-        fps_text = font.render(f"FPS: {fps:.2f}", True, (255, 255, 255))
-        screen.blit(fps_text, (10, 70))
+        # The FPS readout only changes a few times per second so it is not re-rendered every frame
+        if pygame.time.get_ticks() - fps_updated_at >= FPS_REFRESH_INTERVAL:
+            fps_updated_at = pygame.time.get_ticks()
+            fps_text = f"FPS: {clock.get_fps():.2f}"
+        renderer.add(screen.blit(fps_label.render(fps_text), (10, 70)))
         
         # Extract the current year from current_play_time
         if play_button.is_playing:
@@ -416,43 +514,125 @@ def animate_typhoons(year, basin):
             if current_year > year:
                 play_button.is_playing = False  # Pause the simulation
 
+        seek_time = None
         for event in pygame.event.get():
-            if event.type == pygame.QUIT:
+            slider_fraction = timeline_slider.handle_event(event)
+            if slider_fraction is not None:
+                seek_time = slider_fraction * timeline_duration
+            elif event.type == pygame.QUIT:
                 running = False
-            elif event.type == pygame.MOUSEBUTTONDOWN:
+            elif event.type == pygame.VIDEOEXPOSE:
+                renderer.invalidate()
+            elif event.type == pygame.MOUSEWHEEL:
+                view.zoom_at(pygame.mouse.get_pos(), ZOOM_STEP ** event.y)
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 3:
+                panning = True
+            elif event.type == pygame.MOUSEBUTTONUP and event.button == 3:
+                panning = False
+            elif event.type == pygame.MOUSEMOTION and panning:
+                view.pan(*event.rel)
+            # Wheel notches also arrive as MOUSEBUTTONDOWN (buttons 4 and 5) and must only zoom
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
                 # Check if play/pause button is clicked
                 if play_button.is_clicked(event.pos):
                     play_button.toggle()
-                    if play_button.is_playing:
-                        start_ticks = pygame.time.get_ticks() - elapsed_time
                 # Check if skip button is clicked
                 elif skip_button.is_clicked(event.pos):
-                    start_ticks -= 7 * 24 * 60 * 60 * 1000 * TIME_SCALE_FACTOR  # Convert days to milliseconds
+                    seek_time = elapsed_time + WEEK_MS
                 # Check if back button is clicked
                 elif back_button.is_clicked(event.pos):
                     running = False  # Exit the loop and return to main
-
-        # Update and draw typhoons only if not paused
-        if play_button.is_playing:
-            elapsed_time = pygame.time.get_ticks() + skip_time - start_ticks
+                # The playback rate button cycles through the rates
+                elif rate_button.is_clicked(event.pos):
+                    playback_rate = PLAYBACK_RATES[(PLAYBACK_RATES.index(playback_rate) + 1) % len(PLAYBACK_RATES)]
+                    rate_button.text = playback_rate_text(playback_rate)
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_c:
+                    # Toggle the typhoon sprite cache to compare frame rates
+                    Typhoon.use_sprite_cache = not Typhoon.use_sprite_cache
+                    print(f"Sprite cache {'enabled' if Typhoon.use_sprite_cache else 'disabled'}")
+                elif event.key == pygame.K_d:
+                    # Toggle dirty rect rendering to compare frame rates
+                    use_dirty_rects = not use_dirty_rects
+                    renderer = DirtyRectRenderer(screen, background) if use_dirty_rects else FullRenderer(screen, background)
+                    print(f"Dirty rect rendering {'enabled' if use_dirty_rects else 'disabled'}")
+                # Arrow keys seek by a day, or by a week with Shift held
+                elif event.key in (pygame.K_LEFT, pygame.K_RIGHT):
+                    seek_step = WEEK_MS if event.mod & pygame.KMOD_SHIFT else DAY_MS
+                    seek_time = elapsed_time + (seek_step if event.key == pygame.K_RIGHT else -seek_step)
+                # + and - zoom around the center of the window, 0 shows the whole map again
+                elif event.key in (pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS, pygame.K_MINUS, pygame.K_KP_MINUS):
+                    zoom_in = event.key in (pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS)
+                    view.zoom_at((screen_width / 2, screen_height / 2), ZOOM_STEP if zoom_in else 1 / ZOOM_STEP)
+                elif event.key in (pygame.K_0, pygame.K_KP0):
+                    view.reset()
+                elif event.key == pygame.K_HOME:
+                    seek_time = 0
+                elif event.key == pygame.K_END:
+                    seek_time = timeline_duration
+                # [ and ] step the playback rate down and up, down to rewinding
+                elif event.key in (pygame.K_LEFTBRACKET, pygame.K_RIGHTBRACKET):
+                    rate_index = PLAYBACK_RATES.index(playback_rate) + (1 if event.key == pygame.K_RIGHTBRACKET else -1)
+                    playback_rate = PLAYBACK_RATES[min(max(rate_index, 0), len(PLAYBACK_RATES) - 1)]
+                    rate_button.text = playback_rate_text(playback_rate)
+
+        # Seeking works while paused too, and playback carries on from the new time
+        if seek_time is not None:
+            elapsed_time = min(max(seek_time, 0), timeline_duration)
+        elif play_button.is_playing:
+            # Animation time runs at the playback rate, so changing it never moves the storms
+            elapsed_time = min(max(elapsed_time + clock.get_time() * playback_rate, 0), timeline_duration)
+            if elapsed_time == 0 and playback_rate < 0:
+                play_button.toggle()  # Rewound to the start
+
+        # Run the simulation steps that fit in the time the last frame took
+        for _ in range(timestep.advance(clock.get_time() / 1000.0)):
+            engine.spin(SIMULATION_STEP)
+            if play_button.is_playing:
+                for index in engine.visible:
+                    typhoon_objects[index].update_landfall_crosses(SIMULATION_STEP)
+        engine.interpolation = timestep.alpha
+
+        # Update typhoons only if not paused or the timeline was moved
+        if play_button.is_playing or seek_time is not None:
             current_play_time = earliest_time + timedelta(seconds=(elapsed_time / 1000) / TIME_SCALE_FACTOR)
-            
-            for typhoon in typhoon_objects:
-                typhoon.update(elapsed_time, clock.get_time() / 1000.0)
-
-        if play_button.is_playing:
             formatted_time = current_play_time.strftime('%Y-%m-%d %H:%M')
 
+            # After jumping back the engine reports the landfalls passed so far again. While rewinding
+            # it does not, and the crosses of landfalls that are now ahead are dropped instead.
+            going_back = engine.elapsed_time is not None and elapsed_time < engine.elapsed_time
+            if going_back and seek_time is not None:
+                for typhoon in typhoon_objects:
+                    typhoon.landfall_crosses = []
+
+            previously_visible = engine.visible
+            for index, lat, lon in engine.update(elapsed_time, replay_landfalls=seek_time is not None):
+                typhoon = typhoon_objects[index]
+                typhoon.add_landfall_cross(typhoon.latlon_to_screen(lat, lon))
+            if going_back and seek_time is None:
+                # Storms rewound to before their arrival have passed no landfalls
+                for index in set(previously_visible.tolist()) - set(engine.visible.tolist()):
+                    typhoon_objects[index].landfall_crosses = []
+                for index in engine.visible:
+                    typhoon_objects[index].rewind_landfall_crosses(engine.passed_landfalls(index))
+
+        renderer.add(timeline_slider.draw(screen, elapsed_time / timeline_duration))
+
         # Render the current time at the bottom-right of the screen
-        current_time_text = font.render(f"Current Time: {formatted_time}", True, (255, 255, 255))
-        screen.blit(current_time_text, (screen_width - current_time_text.get_width() - 10, screen_height - current_time_text.get_height() - 10))
+        current_time_text = time_label.render(f"Current Time: {formatted_time}")
+        renderer.add(screen.blit(current_time_text, (screen_width - current_time_text.get_width() - 10, screen_height - current_time_text.get_height() - 10)))
 
-        for typhoon in typhoon_objects:
-            typhoon.draw(screen, clock.get_time() / 1000.0)
+        # Only storms on screen are drawn, with less detail when the map is crowded,
+        # time flies by or frames run over budget
+        detail = min(governor.detail, detail_for_storm_count(len(engine.visible), view.zoom))
+        if play_button.is_playing and abs(playback_rate) >= LOW_DETAIL_RATE:
+            detail = min(detail, DETAIL_NO_LABELS)
+        renderer.add(draw_typhoons(screen, [typhoon_objects[index] for index in engine.visible], cross_overlay, detail, view))
 
         # Refresh display
-        pygame.display.flip()
-        clock.tick(60)
+        renderer.end_frame()
+        clock.tick(frame_rate_cap)
+        governor.record(clock.get_rawtime())  # Time spent on the frame, without waiting for the cap
 
     # Return to the main menu after exiting the loop
     main()
@@ -482,10 +662,10 @@ def main():
             continue  # Prompt the user again if the date is invalid or too old
 
         print(f"Start Date: {start_date}")
-        break  # Exit the loop if a valid date is entered
 
-    # Initialize the typhoon dataset based on the selected start date
-    initialize_dataset(screen, screen_width, screen_height, start_date, selected_basin)
+        # Initialize the typhoon dataset based on the selected start date, back to the menu if it is empty
+        if initialize_dataset(screen, screen_width, screen_height, start_date, selected_basin):
+            break  # Exit the loop once there are storms to show
     
     # After scraping is done, proceed with the next steps
     print("Data scraping complete!")
@@ -0,0 +1,37 @@
+from sprite_cache import SpriteCache
+
+TEXT_MEMORY_CAP = 8 * 1024 * 1024  # bytes
+
+# Rendered strings shared by the buttons, typhoon labels and HUD
+_text_cache = SpriteCache(TEXT_MEMORY_CAP)
+
+
+def render_text(font, text, color, antialias=True):
+    """
+    Render text with the given font, reusing the surface from an earlier call with the same arguments.
+    The returned surface is shared, so callers must not draw on it or change its alpha.
+    """
+    key = (font, text, tuple(color), antialias)
+    return _text_cache.get(key, lambda: font.render(text, antialias, color))
+
+
+def clear():
+    """Drop every cached string, e.g. when fonts are recreated after pygame.quit()."""
+    _text_cache.clear()
+
+
+class TextLabel:
+    """A piece of text that is only re-rendered when its content changes."""
+
+    def __init__(self, font, color, antialias=True):
+        self.font = font
+        self.color = color
+        self.antialias = antialias
+        self.text = None
+        self.surface = None
+
+    def render(self, text):
+        if text != self.text:
+            self.text = text
+            self.surface = self.font.render(text, self.antialias, self.color)
+        return self.surface
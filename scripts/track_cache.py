@@ -0,0 +1,234 @@
+import argparse
+import glob
+import json
+import math
+import os
+import struct
+
+import numpy as np
+
+from track_model import Track, parse_time
+
+# File layout: MAGIC, little-endian uint32 header length, JSON header, then one 8-byte aligned block per column.
+MAGIC = b"SCTRACK1"
+ALIGNMENT = 8
+
+# Track point columns and their on-disk types
+COLUMNS = {
+    "time": "<i8",      # Unix time (UTC) of the track point
+    "lat": "<f4",
+    "long": "<f4",
+    "wind": "<i2",      # Wind speed in knots
+    "pressure": "<i2",  # Pressure in hPa
+    "class": "<i1"
+}
+
+MISSING_TIME = np.iinfo(np.int64).min
+# Stored for the "< 35" kt and "> 1008" hPa placeholders the scraper writes for unreported values
+MISSING_VALUE = -1
+MISSING_WIND = "< 35"
+MISSING_PRESSURE = "> 1008"
+
+
+def encode_time(value):
+    if value is None:
+        return MISSING_TIME
+    return parse_time(value)
+
+
+def decode_times(values):
+    """Format a column of Unix times back into track time strings."""
+    # The missing-time sentinel is also numpy's NaT, so it comes out as "NaT"
+    strings = np.datetime_as_string(np.asarray(values).astype("datetime64[s]"), unit="m").tolist()
+    return [None if value == "NaT" else value.replace("T", " ") for value in strings]
+
+
+def encode_measure(value, missing):
+    return MISSING_VALUE if value == missing else int(value)
+
+
+def decode_measure(value, missing):
+    return missing if value == MISSING_VALUE else str(int(value))
+
+
+def decode_coordinate(value):
+    # float32 cannot hold values like 8.6 exactly, so round back to the precision of the source data
+    return None if math.isnan(value) else round(value, 4)
+
+
+class TrackArrays:
+    """
+    Columnar view of a basin-year: one array per track point column plus a storm offset table.
+
+    The points of storm i are rows offsets[i]:offsets[i + 1] of every column. Per-storm values
+    other than the path (name, source, ...) are kept as plain dicts in `storms`.
+    """
+
+    def __init__(self, storms, offsets, columns):
+        self.storms = storms
+        self.offsets = offsets
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.storms)
+
+    def storm_slice(self, index):
+        return slice(int(self.offsets[index]), int(self.offsets[index + 1]))
+
+    @classmethod
+    def from_typhoons(cls, typhoons):
+        """Build the columns from scraped typhoon dicts. Raises ValueError for values the format cannot hold."""
+        points = [point for typhoon in typhoons for point in typhoon["path"]]
+        offsets = np.zeros(len(typhoons) + 1, dtype="<i8")
+        offsets[1:] = np.cumsum([len(typhoon["path"]) for typhoon in typhoons])
+
+        try:
+            columns = {
+                "time": np.array([encode_time(point["time"]) for point in points], dtype=COLUMNS["time"]),
+                "lat": np.array([np.nan if point["lat"] is None else point["lat"] for point in points], dtype=COLUMNS["lat"]),
+                "long": np.array([np.nan if point["long"] is None else point["long"] for point in points], dtype=COLUMNS["long"]),
+                "wind": np.array([encode_measure(point["speed"], MISSING_WIND) for point in points], dtype=COLUMNS["wind"]),
+                "pressure": np.array([encode_measure(point["pressure"], MISSING_PRESSURE) for point in points], dtype=COLUMNS["pressure"]),
+                "class": np.array([point["class"] for point in points], dtype=COLUMNS["class"])
+            }
+        except (TypeError, OverflowError) as e:
+            raise ValueError(f"Track data cannot be stored in columnar form: {e}")
+
+        storms = [{key: value for key, value in typhoon.items() if key != "path"} for typhoon in typhoons]
+        return cls(storms, offsets, columns)
+
+    def to_typhoons(self):
+        """Rebuild the typhoon dicts in the same format as the JSON cache."""
+        times = decode_times(self.columns["time"])
+        lats = self.columns["lat"].tolist()
+        longs = self.columns["long"].tolist()
+        winds = self.columns["wind"].tolist()
+        pressures = self.columns["pressure"].tolist()
+        classes = self.columns["class"].tolist()
+
+        typhoons = []
+        for index, storm in enumerate(self.storms):
+            path = [
+                {
+                    "time": times[i],
+                    "lat": decode_coordinate(lats[i]),
+                    "long": decode_coordinate(longs[i]),
+                    "speed": decode_measure(winds[i], MISSING_WIND),
+                    "pressure": decode_measure(pressures[i], MISSING_PRESSURE),
+                    "class": classes[i]
+                }
+                for i in range(*self.storm_slice(index).indices(len(times)))
+            ]
+            typhoon = {"name": storm.get("name"), "path": path}
+            typhoon.update((key, value) for key, value in storm.items() if key != "name")
+            typhoons.append(typhoon)
+        return typhoons
+
+    def to_tracks(self):
+        """Build the Track of every storm straight from the typed columns, without formatting or parsing times."""
+        times = self.columns["time"].tolist()
+        lats = self.columns["lat"].tolist()
+        longs = self.columns["long"].tolist()
+        winds = self.columns["wind"].tolist()
+        pressures = self.columns["pressure"].tolist()
+        classes = self.columns["class"].tolist()
+
+        tracks = []
+        for index in range(len(self.storms)):
+            rows = self.storm_slice(index)
+            tracks.append(Track(
+                times[rows],
+                [{"lat": decode_coordinate(lat), "long": decode_coordinate(long)} for lat, long in zip(lats[rows], longs[rows])],
+                classes[rows],
+                [decode_measure(wind, MISSING_WIND) for wind in winds[rows]],
+                [decode_measure(pressure, MISSING_PRESSURE) for pressure in pressures[rows]]
+            ))
+        return tracks
+
+
+def _aligned(position):
+    return (position + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def save(path, typhoons):
+    """Write typhoon dicts to a columnar track file. Raises ValueError if they cannot be stored exactly."""
+    track_arrays = TrackArrays.from_typhoons(typhoons)
+    arrays = {"offsets": track_arrays.offsets, **track_arrays.columns}
+
+    # Header offsets depend on the header size, so lay the blocks out relative to the data start first
+    layout = {}
+    position = 0
+    for name, array in arrays.items():
+        position = _aligned(position)
+        layout[name] = {"dtype": array.dtype.str, "count": len(array), "offset": position}
+        position += array.nbytes
+
+    header = {"storms": track_arrays.storms, "arrays": layout}
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    data_start = _aligned(len(MAGIC) + 4 + len(header_bytes))
+
+    temp_file = f"{path}.tmp"
+    with open(temp_file, "wb") as file:
+        file.write(MAGIC)
+        file.write(struct.pack("<I", len(header_bytes)))
+        file.write(header_bytes)
+        for name, array in arrays.items():
+            file.write(b"\0" * (data_start + layout[name]["offset"] - file.tell()))
+            file.write(array.tobytes())
+
+    # Only replace the previous file once the new one is known to read back as the same data
+    if load(temp_file).to_typhoons() != typhoons:
+        os.remove(temp_file)
+        raise ValueError("Track data does not round-trip exactly through the columnar format")
+    os.replace(temp_file, path)
+
+
+def load(path):
+    """Memory-map a columnar track file. Raises ValueError if the file is not a valid track file."""
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a track cache file")
+        (header_length,) = struct.unpack("<I", file.read(4))
+        header = json.loads(file.read(header_length).decode("utf-8"))
+    data_start = _aligned(len(MAGIC) + 4 + header_length)
+
+    arrays = {}
+    for name, block in header["arrays"].items():
+        if block["count"] == 0:
+            arrays[name] = np.empty(0, dtype=block["dtype"])
+        else:
+            arrays[name] = np.memmap(path, dtype=block["dtype"], mode="r",
+                                     offset=data_start + block["offset"], shape=(block["count"],))
+
+    offsets = arrays.pop("offsets")
+    return TrackArrays(header["storms"], offsets, arrays)
+
+
+def convert_folder(folder_path="data", remove_json=False):
+    """Convert every *_data.json cache in a folder to a track file, verifying that it round-trips exactly."""
+    for json_file in sorted(glob.glob(os.path.join(folder_path, "*_data.json"))):
+        track_file = f"{json_file[:-len('.json')]}.track"
+        with open(json_file, "r") as file:
+            typhoons = json.load(file)
+
+        try:
+            save(track_file, typhoons)
+        except ValueError as e:
+            print(f"Skipping {json_file}: {e}")
+            continue
+
+        print(f"{json_file}: {os.path.getsize(json_file)} -> {os.path.getsize(track_file)} bytes")
+        if remove_json:
+            os.remove(json_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert JSON typhoon caches to the columnar track format.")
+    parser.add_argument("folder", nargs="?", default="data", help="Cache folder to convert.")
+    parser.add_argument("--remove-json", action="store_true", help="Delete each JSON file once it has been converted.")
+    args = parser.parse_args()
+    convert_folder(args.folder, args.remove_json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import calendar
+import re
+from datetime import datetime, timezone
+
+TIME_PATTERN = re.compile(r"(\d{4})-(\d{2})-(\d{2}) (\d{2}):(\d{2})$")
+
+
+def parse_time(value):
+    """Convert a "YYYY-MM-DD HH:MM" track time (UTC) to Unix time. Raises ValueError for other formats."""
+    match = TIME_PATTERN.match(value)
+    if not match:
+        raise ValueError(f"Invalid track time: {value}")
+    return calendar.timegm(tuple(int(part) for part in match.groups()) + (0,))
+
+
+def to_timestamp(date):
+    """Convert a naive UTC datetime to Unix time."""
+    return calendar.timegm(date.timetuple())
+
+
+def to_datetime(timestamp):
+    """Convert Unix time to a naive UTC datetime."""
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+
+class Track:
+    """
+    Typed, pre-parsed version of a typhoon's path, built once when the data is loaded.
+
+    Times are Unix seconds and durations[i] is the length of the segment from point i to
+    point i + 1, so nothing needs to be parsed while the animation is running.
+    """
+
+    def __init__(self, times, positions, classes, speeds, pressures):
+        self.times = times
+        self.positions = positions
+        self.classes = classes
+        self.speeds = speeds
+        self.pressures = pressures
+        self.durations = [end - start for start, end in zip(times, times[1:])]
+
+    @classmethod
+    def from_path(cls, path):
+        return cls(
+            [parse_time(point['time']) for point in path],
+            [{'lat': point['lat'], 'long': point['long']} for point in path],
+            [point.get('class', 0) for point in path],
+            [point.get('speed', 'N/A') for point in path],
+            [point.get('pressure', 'N/A') for point in path]
+        )
+
+    def __len__(self):
+        return len(self.times)
+
+    @property
+    def start_time(self):
+        return self.times[0]
+
+    @property
+    def end_time(self):
+        return self.times[-1]
@@ -1,42 +1,75 @@
+import os
 import pygame
 import math
 from math import radians, tan, log, pi
-from datetime import datetime
-from map_image_processor import MapImageProcessor
+from sprite_cache import SpriteCache, quantize
+from text_cache import render_text
+from level_of_detail import DETAIL_GLYPH, DETAIL_FULL
+
+# Quantization of the cached blade and dot sprites
+COLOR_STEP = 8
+ALPHA_STEP = 8
+ANGLE_STEP = 2
+BLADE_SYMMETRY = 60  # The six blades look the same after every 60 degree turn
+
+# Longitude and latitude extent of each basin's map: [min_lon, max_lon, min_lat, max_lat]
+BASIN_BOUNDARIES = {
+    "western_pacific": [100, 180, 0, 60],
+    "northern_atlantic": [-100, -20, 0, 60],
+    "eastern_pacific": [-175, -95, 0, 60],
+    "northern_indian": [40, 100, -10, 35],
+    "southern_indian": [20, 120, -75, 0]
+}
 
 class Typhoon:
-    def __init__(self, name, path, start_time, category_colors, screen_width, screen_height, time_scale_factor, reference_map, basin, fade_in_duration=1, fade_out_duration=0.5, ):
+    # Blade and dot sprites shared by every typhoon. Set use_sprite_cache to False to redraw them every frame.
+    sprite_cache = SpriteCache()
+    use_sprite_cache = os.getenv("STORMCHASER_SPRITE_CACHE", "1") != "0"
+    # Font shared by every typhoon's labels so their rendered text can be reused across storms
+    label_font = None
+
+    def __init__(self, name, engine, index, screen_width, screen_height, basin):
+        """View of storm `index` of a StormEngine, which holds its animation state."""
         self.name = name
-        self.path = path
-        self.start_time = start_time
-        self.category_colors = category_colors
-        self.fade_in_duration = fade_in_duration
-        self.fade_out_duration = fade_out_duration
+        self.engine = engine
+        self.index = index
+        self.track = engine.tracks[index]
         self.screen_width = screen_width
         self.screen_height = screen_height
-        self.time_scale_factor = time_scale_factor
-        self.reference_map = reference_map
         self.basin = basin
-        self.basin_boundaries = {
-            "western_pacific": [100, 180, 0, 60],
-            "northern_atlantic": [-100, -20, 0, 60],
-            "eastern_pacific": [-175, -95, 0, 60],
-            "northern_indian": [40, 100, -10, 35],
-            "southern_indian": [20, 120, -75, 0]
-        }
-
-        self.current_step = 0
-        self.current_position = {'lat': path[0]['lat'], 'long': path[0]['long']}
-        self.alpha = 0
-        self.active = True
-        self.blade_angle = 0
-        self.current_color = (0, 0, 0, 0)  # Start fully transparent
-        self.is_in_water = True
+        self.basin_boundaries = BASIN_BOUNDARIES
         self.landfall_crosses = []  # To store landfall crosses with a timer
 
         # Font for rendering the typhoon name, wind speed, and pressure
-        self.font = pygame.font.Font(None, 20)  # Default font with size 24
+        if Typhoon.label_font is None:
+            Typhoon.label_font = pygame.font.Font(None, 20)  # Default font with size 24
+        self.font = Typhoon.label_font
+        self.label_step = None
+        self.label_surfaces = None
 
+    @property
+    def current_step(self):
+        return int(self.engine.steps[self.index])
+
+    @property
+    def current_position(self):
+        return {'lat': float(self.engine.lats[self.index]), 'long': float(self.engine.longs[self.index])}
+
+    @property
+    def alpha(self):
+        return float(self.engine.alphas[self.index])
+
+    @property
+    def current_color(self):
+        return tuple(self.engine.colors[self.index].tolist()) + (int(self.engine.color_alphas[self.index]),)
+
+    @property
+    def blade_angle(self):
+        return self.engine.blade_angle(self.index)
+
+    @property
+    def active(self):
+        return self.engine.is_active(self.index)
 
     def latlon_to_screen(self, lat, lon):
         """
@@ -61,85 +94,42 @@ class Typhoon:
 
 
         
-    def check_for_landfall(self, img):
-        if img:
-            screen_position = self.latlon_to_screen(self.current_position['lat'], self.current_position['long'])
-            coordinate_color = MapImageProcessor.is_color_at_coordinate(
-                img, screen_position[0], screen_position[1], (0, 0, 70)
-            )
-            if self.is_in_water != coordinate_color and self.is_in_water:
-                # Add a cross at the landfall position with initial animation properties
-                self.landfall_crosses.append({
-                    "position": screen_position,
-                    "scale": 30.0,  # Start with a large scale for zoom-in animation
-                    "fade_alpha": 255  # Fully opaque initially
-                })
-            self.is_in_water = coordinate_color
-            
+    def add_landfall_cross(self, screen_position):
+        # Add a cross at the landfall position with initial animation properties
+        self.landfall_crosses.append({
+            "position": screen_position,
+            "scale": 30.0,  # Start with a large scale for zoom-in animation
+            "fade_alpha": 255  # Fully opaque initially
+        })
+
+    def rewind_landfall_crosses(self, landfalls):
+        """
+        Keep the crosses of the landfalls the storm has still passed after playing backwards.
+        Crosses that were dropped when the storm faded out come back already zoomed in.
+        """
+        if len(self.landfall_crosses) >= len(landfalls):
+            del self.landfall_crosses[len(landfalls):]
+            return
+        for lat, lon in landfalls[len(self.landfall_crosses):]:
+            self.add_landfall_cross(self.latlon_to_screen(lat, lon))
+            self.landfall_crosses[-1]["scale"] = 1.0
+
     def update_landfall_crosses(self, dt):
         """Update the animation properties of landfall crosses."""
+        if not self.landfall_crosses:
+            return
+        alpha = self.alpha
         for cross in self.landfall_crosses:
             # Zoom-in effect: reduce the scale over time
             if cross["scale"] > 1.0:
                 cross["scale"] = max(cross["scale"] - 80.0 * dt, 1.0)  # Shrink to normal size
 
             # Start fading only when the typhoon begins to fade
-            cross["fade_alpha"] = self.alpha
+            cross["fade_alpha"] = alpha
 
         # Remove crosses that are fully transparent
         self.landfall_crosses = [cross for cross in self.landfall_crosses if cross["fade_alpha"] > 0]
         
-    def draw_landfall_crosses(self, screen):
-        """Draw all landfall crosses with transparency as diagonal X marks."""
-        for cross in self.landfall_crosses:
-            # Create a transparent surface
-            cross_surface_size = int(50 * cross["scale"])  # Size depends on the scale
-            cross_surface = pygame.Surface((cross_surface_size, cross_surface_size), pygame.SRCALPHA)
-
-            # Set up the cross's color with transparency
-            color = (255, 0, 0, int(cross["fade_alpha"]))  # Red with transparency
-
-            # Draw the diagonal cross (X) on the transparent surface
-            center = cross_surface_size // 2
-            line_length = int(4.5 * cross["scale"])  # Scale the line length
-            pygame.draw.line(cross_surface, color, 
-                            (center - line_length, center - line_length), 
-                            (center + line_length, center + line_length), 3)  # Top-left to bottom-right
-            pygame.draw.line(cross_surface, color, 
-                            (center - line_length, center + line_length), 
-                            (center + line_length, center - line_length), 3)  # Bottom-left to top-right
-
-            # Blit the cross surface onto the main screen at the correct position
-            cross_x, cross_y = cross["position"]
-            screen.blit(cross_surface, (cross_x - center, cross_y - center))
-
-    def distance(self, point1, point2):
-        """Calculate the distance between two points."""
-        return math.sqrt((point2['lat'] - point1['lat'])**2 + (point2['long'] - point1['long'])**2)
-
-    def move_constant_speed(self, point1, point2, duration, dt):
-        """Move at a constant speed between two points."""
-        total_distance = self.distance(point1, point2)
-        if total_distance == 0:  # Avoid division by zero
-            return point2
-
-        # Calculate the required speed to cover the total distance in the given duration
-        speed = total_distance / duration
-
-        # Calculate the direction vector (unit vector)
-        direction_lat = (point2['lat'] - point1['lat']) / total_distance
-        direction_long = (point2['long'] - point1['long']) / total_distance
-
-        # Calculate the distance to move this frame
-        move_distance = speed * dt
-        new_lat = self.current_position['lat'] + direction_lat * move_distance
-        new_long = self.current_position['long'] + direction_long * move_distance
-
-        # Check if the new position exceeds the target
-        if self.distance(point1, {'lat': new_lat, 'long': new_long}) >= total_distance:
-            return point2  # Snap to the target point
-        return {'lat': new_lat, 'long': new_long}
-
     def create_blade_surface(self, color_with_alpha, num_blades=6, base_radius=8, spiral_factor=10, blade_length=32):
         surface_size = 2 * (base_radius + spiral_factor * math.log1p(blade_length))
         blade_surface = pygame.Surface((surface_size, surface_size), pygame.SRCALPHA)
@@ -165,88 +155,106 @@ class Typhoon:
         pygame.draw.circle(dot_surface, color_with_alpha, (dot_radius, dot_radius), dot_radius)
         return dot_surface.convert_alpha()
 
-    def update(self, elapsed_time, dt):
-        """Update typhoon and storm animation."""
-        self.update_landfall_crosses(dt)
-        # Does not arrive yet, skip
-        if elapsed_time < self.start_time:
-            return
-        
-        # Fade out
-        if self.current_step >= len(self.path) - 1:
-            if self.alpha > 0:
-                self.alpha = max(self.alpha - (255 / self.fade_out_duration) * dt, 0)
-                self.current_color = (*self.current_color[:3], int(self.alpha))
-            else:
-                self.active = False
-            return
+    def create_glyph_surface(self, color_with_alpha, radius=14):
+        """Ring with a dot in the middle, drawn in place of the blades when there is no time for detail."""
+        glyph_surface = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
+        pygame.draw.circle(glyph_surface, color_with_alpha, (radius, radius), radius, 3)
+        pygame.draw.circle(glyph_surface, color_with_alpha, (radius, radius), 5)
+        return glyph_surface.convert_alpha()
+
+    def quantized_color(self):
+        """Current color and alpha snapped to the steps cached sprites are keyed on."""
+        color = tuple(quantize(channel, COLOR_STEP) for channel in self.current_color[:3])
+        return color + (quantize(self.current_color[3], ALPHA_STEP),)
+
+    def get_cached_sprites(self):
+        """Look up the rotated blade and center dot for the current color, alpha and angle."""
+        color_with_alpha = self.quantized_color()
+        angle = quantize(self.blade_angle % BLADE_SYMMETRY, ANGLE_STEP, BLADE_SYMMETRY) % BLADE_SYMMETRY
+
+        blade_surface = Typhoon.sprite_cache.get(
+            ("blade", color_with_alpha), lambda: self.create_blade_surface(color_with_alpha)
+        )
+        rotated_blade = Typhoon.sprite_cache.get(
+            ("rotated_blade", color_with_alpha, angle), lambda: pygame.transform.rotate(blade_surface, angle)
+        )
+        center_dot = Typhoon.sprite_cache.get(
+            ("dot", color_with_alpha), lambda: self.create_center_dot_surface(color_with_alpha)
+        )
+        return rotated_blade, center_dot
+
+    def get_label_surfaces(self):
+        """Return the name, wind speed and pressure labels, rendering them again only when the track step changes."""
+        if self.label_step != self.current_step:
+            self.label_step = self.current_step
+            wind_speed = self.track.speeds[self.current_step]
+            pressure = self.track.pressures[self.current_step]
+            self.label_surfaces = (
+                render_text(self.font, self.name, (255, 255, 255)),  # White text
+                render_text(self.font, f"{wind_speed} kt", (255, 255, 255)),
+                render_text(self.font, f"{pressure} hPa", (255, 255, 255))
+            )
+        return self.label_surfaces
 
-        self.check_for_landfall(self.reference_map)
-        # Update position
-        point1 = self.path[self.current_step]
-        point2 = self.path[self.current_step + 1]
-        time_diff = (datetime.strptime(point2['time'], '%Y-%m-%d %H:%M') - 
-                     datetime.strptime(point1['time'], '%Y-%m-%d %H:%M')).total_seconds() / 3600
-        animation_duration = time_diff * self.time_scale_factor * 3600
-        self.current_position = self.move_constant_speed(point1, point2, animation_duration, dt)
-
-        # Fade in
-        if self.alpha < 255:
-            self.alpha = min(self.alpha + (255 / self.fade_in_duration) * dt, 255)
-
-        # Update color blending
-        target_color = self.category_colors.get(point2['class'], (0, 0, 0))
-        blend_speed = 4
-        self.current_color = tuple(
-            int(self.current_color[i] + (target_color[i] - self.current_color[i]) * blend_speed * dt)
-            for i in range(3)
-        ) + (int(self.alpha),)
-
-        # Update to the next step if at the target
-        if self.current_position == point2:
-            self.current_step += 1
-        
-    def draw(self, screen, dt):
+    def draw(self, screen, detail=DETAIL_FULL, view=None):
+        """
+        Draw the typhoon and its labels at the given level of detail (see level_of_detail.py),
+        zoomed and panned by the MapView if there is one. Landfall crosses are drawn by draw_typhoons().
+        Returns the rects drawn.
+        """
         # Early return for inactive typhoons
         if self.alpha <= 0:
-            return
-        
-        # Draw landfall crosses
-        self.draw_landfall_crosses(screen) 
+            return []
         
         screen_x, screen_y = self.latlon_to_screen(self.current_position['lat'], self.current_position['long'])
-        # Dynamically regenerate surfaces with current color and alpha
-        blade_surface = self.create_blade_surface(self.current_color)
-        center_dot = self.create_center_dot_surface(self.current_color)
-        rotated_blade = pygame.transform.rotate(blade_surface, self.blade_angle)
+        if view is not None:
+            screen_x, screen_y = view.to_screen(screen_x, screen_y)
+        if detail == DETAIL_GLYPH:
+            color_with_alpha = self.quantized_color()
+            glyph = Typhoon.sprite_cache.get(("glyph", color_with_alpha), lambda: self.create_glyph_surface(color_with_alpha))
+            return [screen.blit(glyph, glyph.get_rect(center=(screen_x, screen_y)))]
+
+        dirty_rects = []
+        if Typhoon.use_sprite_cache:
+            rotated_blade, center_dot = self.get_cached_sprites()
+        else:
+            # Dynamically regenerate surfaces with current color and alpha
+            blade_surface = self.create_blade_surface(self.current_color)
+            center_dot = self.create_center_dot_surface(self.current_color)
+            rotated_blade = pygame.transform.rotate(blade_surface, self.blade_angle)
 
         # Compute the blit position to center the rotated image
         blade_rect = rotated_blade.get_rect(center=(screen_x, screen_y))
-        screen.blit(rotated_blade, blade_rect.topleft)
+        dirty_rects.append(screen.blit(rotated_blade, blade_rect.topleft))
 
         # Blit the center dot
         dot_rect = center_dot.get_rect(center=(screen_x, screen_y))
-        screen.blit(center_dot, dot_rect.topleft)
+        dirty_rects.append(screen.blit(center_dot, dot_rect.topleft))
 
-        # Get wind speed and pressure at the current point in the path
-        wind_speed = self.path[self.current_step].get('speed', 'N/A')
-        pressure = self.path[self.current_step].get('pressure', 'N/A')
+        if detail < DETAIL_FULL:
+            return dirty_rects
 
-        # Render and blit the typhoon's name below the typhoon center
-        name_surface = self.font.render(self.name, True, (255, 255, 255))  # White text
+        name_surface, wind_speed_surface, pressure_surface = self.get_label_surfaces()
+
+        # Blit the typhoon's name below the typhoon center
         name_rect = name_surface.get_rect(center=(screen_x, screen_y + 53))  # 20 pixels below the typhoon center
-        screen.blit(name_surface, name_rect.topleft)
+        dirty_rects.append(screen.blit(name_surface, name_rect.topleft))
 
-        # Render and blit wind speed below the name
-        wind_speed_surface = self.font.render(f"{wind_speed} kt", True, (255, 255, 255))
+        # Blit wind speed below the name
         wind_speed_rect = wind_speed_surface.get_rect(center=(screen_x, screen_y + 64))  # 20 pixels below the name
-        screen.blit(wind_speed_surface, wind_speed_rect.topleft)
+        dirty_rects.append(screen.blit(wind_speed_surface, wind_speed_rect.topleft))
 
-        # Render and blit pressure below the wind speed
-        pressure_surface = self.font.render(f"{pressure} hPa", True, (255, 255, 255))
+        # Blit pressure below the wind speed
         pressure_rect = pressure_surface.get_rect(center=(screen_x, screen_y + 75))  # 20 pixels below the wind speed
-        screen.blit(pressure_surface, pressure_rect.topleft)
+        dirty_rects.append(screen.blit(pressure_surface, pressure_rect.topleft))
+
+        return dirty_rects
+
 
-        # Some random normalizing formula that changes the typhooon's rotation speed based on its strength
-        typhoon_class = self.path[self.current_step].get('class', '0')
-        self.blade_angle += (1.5 + (pow(1 + typhoon_class, 1.7)/8)) * dt * 100
\ No newline at end of file
+def draw_typhoons(screen, typhoons, cross_overlay, detail=DETAIL_FULL, view=None):
+    """Draw the landfall crosses of all the typhoons on one overlay, then the typhoons on top. Returns the rects drawn."""
+    crosses = [cross for typhoon in typhoons if typhoon.alpha > 0 for cross in typhoon.landfall_crosses]
+    dirty_rects = list(cross_overlay.draw(screen, crosses, view))
+    for typhoon in typhoons:
+        dirty_rects.extend(typhoon.draw(screen, detail, view))
+    return dirty_rects
@@ -1,12 +1,15 @@
 import os
 import json
-import requests
-from bs4 import BeautifulSoup
+import threading
 from datetime import datetime
+from link_index import YearLinkIndex
+import page_parsers
+import track_cache
+from track_model import Track, parse_time
 
-# Base URL of the website
-BASE_URL = "https://ncics.org/ibtracs/index.php"
-BASE_URL_ALT = "https://ncics.org/ibtracs/"
+# Base URL of the website. Can be overridden to point the scraper at a local mirror of recorded pages.
+BASE_URL_ALT = os.getenv("IBTRACS_BASE_URL", "https://ncics.org/ibtracs/")
+BASE_URL = f"{BASE_URL_ALT}index.php"
 
 BASIN_ABBREVIATIONS = {
     "Northern Atlantic": "na",
@@ -17,73 +20,54 @@ BASIN_ABBREVIATIONS = {
     # "Southern Pacific": "sp"
 }
 
-def fetch_year_page(year):
-    """Fetch the page for the given year."""
+# Format new caches are written in: "columnar" (compact track files) or "json"
+CACHE_FORMAT = os.getenv("STORMCHASER_CACHE_FORMAT", "columnar")
+
+# A storm whose last track point is this close (in seconds) to when it was fetched may still be active
+ACTIVE_STORM_WINDOW = 2 * 24 * 60 * 60
+
+_fetcher = None
+_link_indexes = {}
+# The async backfill looks up link indexes from several worker threads at once
+_link_indexes_lock = threading.Lock()
+
+def get_fetcher():
+    """Return the shared page fetcher, creating it on first use."""
+    global _fetcher
+    if _fetcher is None:
+        # requests is only imported once something has to be fetched, not to read cached data
+        from page_fetcher import PageFetcher
+        _fetcher = PageFetcher()
+    return _fetcher
+
+def get_link_index(folder_path="data"):
+    """Return the shared year link index stored in the given cache folder."""
+    key = os.path.abspath(folder_path)
+    with _link_indexes_lock:
+        if key not in _link_indexes:
+            _link_indexes[key] = YearLinkIndex(folder_path)
+        return _link_indexes[key]
+
+def storm_url(link):
+    """URL of a storm page from its link relative to the site."""
+    return f"{BASE_URL_ALT}{link}"
+
+def relative_link(url):
+    """
+    Link of a storm page relative to the site, as listed on the year pages. Storms are identified by it,
+    so they still match when IBTRACS_BASE_URL points somewhere else. Older caches stored the full URL.
+    """
+    return url[len(BASE_URL_ALT):] if url.startswith(BASE_URL_ALT) else url
+
+def scrape_typhoon_links(year, fetcher=None, folder_path="data", max_age=None):
+    """
+    Main function to scrape typhoon links for each basin for a given year.
+    Links are relative to the site. storm_url() turns them into the URL to fetch.
+    """
     url = f"{BASE_URL}?name=YearBasin-{year}"
-    response = requests.get(url)
-    if response.status_code != 200:
-        print(f"Failed to retrieve page for year {year}: {response.status_code}")
-        return None
-    return response.text
-
-def extract_links_from_second_table(html):
-    """Extract and organize links for each typhoon basin."""
-    soup = BeautifulSoup(html, 'html.parser')
-    tables = soup.find_all('table', {'class': 'ishade', 'summary': 'Layout table.'})
-    
-    if len(tables) < 2:
-        print("Less than two tables found on the page.")
-        return None
-    
-    table = tables[1]
-    
-    headers = table.find('tr').find_all('td')
-    basins = [header.text.strip() for header in headers]
-    
-    basin_links = {basin: [] for basin in basins}
-    
-    rows = table.find_all('tr')[1:]
-    for row in rows:
-        cells = row.find_all('td')
-        for index, cell in enumerate(cells):
-            links = cell.find_all('a', href=True)
-            for link in links:
-                basin_links[basins[index]].append(f"{BASE_URL_ALT}{link['href']}")
-    
-    return basin_links
-
-def scrape_fourth_table(link):
-    """Scrape the fourth table from the given link."""
-    response = requests.get(link)
-    if response.status_code != 200:
-        print(f"Failed to retrieve page: {response.status_code}")
-        return None
-
-    soup = BeautifulSoup(response.text, 'html.parser')
-    tables = soup.find_all('table')
-    
-    if len(tables) < 4:
-        print("Less than four tables found on the page.")
-        return None
-
-    table = tables[3]
-    rows = table.find_all('tr')
-    table_data = []
-    
-    for row in rows[2:]:
-        cells = row.find_all(['td', 'th'])
-        row_data = [cell.text.strip() for cell in cells]
-        table_data.append(row_data)
-    
-    return table_data
-
-def scrape_typhoon_links(year):
-    """Main function to scrape typhoon links for each basin for a given year."""
-    page_html = fetch_year_page(year)
-    if page_html is None:
-        return None
-    basin_links = extract_links_from_second_table(page_html)
-    return basin_links
+    return get_link_index(folder_path).get_basin_links(
+        year, url, fetcher or get_fetcher(), page_parsers.parse_year_page, max_age
+    )
 
 def add_missing_dates_and_empty_cells(data):
     """Add missing dates and fill empty cells by referencing the row above, or N / A for the first row."""
@@ -115,44 +99,159 @@ def add_missing_dates_and_empty_cells(data):
     return data
 
 
-def get_typhoon_name_from_link(link):
-    """Extract the typhoon name from the first link's page."""
-    response = requests.get(link)
-    if response.status_code == 200:
-        soup = BeautifulSoup(response.content, 'html.parser')
-        name_element = soup.find('h1')
-        if name_element:
-            return name_element.get_text(strip=True)
-    return None
+def parse_storm_page(html):
+    """Parse the typhoon name and track table out of a single storm page."""
+    if html is None:
+        return None, None
+    return page_parsers.parse_storm_page(html)
 
-def save_cache(data, year, basin_name, folder_path="data"):
-    """Save the scraped data to a basin and year-specific cache file."""
+def build_typhoon_data(typhoon_name, fourth_table_data):
+    """Convert a storm's heading and raw track table into the cached typhoon format."""
+    # Split the string into words
+    composite_name = typhoon_name.split()
+
+    # Get the second-to-last word
+    if len(composite_name) >= 2:
+        typhoon_name = composite_name[-2]
+    else:
+        typhoon_name = "UNKNOWN"
+
+    processed_data = add_missing_dates_and_empty_cells(fourth_table_data)
+
+    typhoon_data = {
+        "name": typhoon_name,
+        "path": []
+    }
+
+    for row in processed_data:
+        time = row[1]
+        if time:
+            try:
+                time_obj = datetime.strptime(time, "%Y-%m-%d %H:%M:%S")
+                time = time_obj.strftime("%Y-%m-%d %H:%M")
+            except ValueError:
+                pass
+
+        lat = row[3] if row[3] != "N / A" else None
+        long = row[4] if row[4] != "N / A" else None
+        speed = row[5] if row[5] != "N / A" else None
+        pressure = row[6] if row[6] != "N / A" else None
 
+        if speed:
+            speed = int(speed)
+            if speed < 34:
+                typhoon_class = "0"
+            elif 34 <= speed <= 63:
+                typhoon_class = "1"
+            elif 64 <= speed <= 82:
+                typhoon_class = "2"
+            elif 83 <= speed <= 95:
+                typhoon_class = "3"
+            elif 96 <= speed <= 112:
+                typhoon_class = "4"
+            elif speed >= 113:
+                typhoon_class = "5"
+        else:
+            typhoon_class = "0"
+
+        typhoon_data["path"].append({
+            "time": time,
+            "lat": float(lat) if lat else None,
+            "long": float(long) if long else None,
+            "speed": str(speed) if speed else "< 35",
+            "pressure": str(pressure) if pressure else "> 1008",
+            "class": int(typhoon_class)
+        })
+
+    if processed_data:
+        try:
+            start_time = datetime.strptime(processed_data[0][1], "%Y-%m-%d %H:%M:%S")
+            start_time = start_time.replace(second=0)
+            typhoon_data["start_time"] = int(start_time.timestamp())
+        except ValueError:
+            typhoon_data["start_time"] = None
+
+    return typhoon_data
+
+def build_storm_from_page(url, html):
+    """Parse a storm page into the cached typhoon format, tagged with its relative source link and fetch time."""
+    link = relative_link(url)
+    typhoon_name, fourth_table_data = parse_storm_page(html)
+    if not typhoon_name:
+        print(f"Failed to extract typhoon name for {link}. Skipping.")
+        return None
+
+    if not fourth_table_data:
+        print(f"Failed to extract data from the fourth table for {link}. Skipping.")
+        return None
+
+    typhoon_data = build_typhoon_data(typhoon_name, fourth_table_data)
+    # Needed to refresh the storm incrementally later on
+    typhoon_data["source"] = link
+    typhoon_data["fetched_at"] = int(datetime.now().timestamp())
+    return typhoon_data
+
+def get_cache_path(year, basin_name, folder_path="data", suffix="data.json"):
+    """Return the path of the basin and year-specific cache file."""
     basin_abbr = BASIN_ABBREVIATIONS.get(basin_name, "unknown")
     if basin_abbr == "unknown":
         print(f"Warning: No abbreviation found for basin '{basin_name}'. Using 'unknown'.")
-    
+
+    # Format the filename using basin abbreviation and year
+    return os.path.join(folder_path, f"{basin_abbr}_{year}_{suffix}")
+
+def save_cache(data, year, basin_name, folder_path="data"):
+    """Save the scraped data to a basin and year-specific cache file."""
+
     if not os.path.exists(folder_path):
         os.makedirs(folder_path)
 
-    # Format the filename using basin abbreviation and year
-    cache_file = os.path.join(folder_path, f"{basin_abbr}_{year}_data.json")
-    
-    with open(cache_file, "w") as file:
-        json.dump(data, file, indent=4)
+    json_file = get_cache_path(year, basin_name, folder_path)
+    track_file = get_cache_path(year, basin_name, folder_path, "data.track")
+    cache_file = json_file
+
+    if CACHE_FORMAT == "columnar":
+        try:
+            track_cache.save(track_file, data)
+            cache_file = track_file
+        except ValueError as e:
+            print(f"{e}. Saving as JSON instead.")
+
+    if cache_file == json_file:
+        # Write to a temporary file first so an interrupted save never leaves a truncated cache behind
+        temp_file = f"{cache_file}.tmp"
+        with open(temp_file, "w") as file:
+            json.dump(data, file, indent=4)
+        os.replace(temp_file, cache_file)
+
+    # Only one format is kept per basin-year so an outdated copy is never loaded
+    stale_file = json_file if cache_file == track_file else track_file
+    if os.path.exists(stale_file):
+        os.remove(stale_file)
     
     print(f"Data cached to file: {cache_file}")
 
 
-def load_cache(year, basin_name, folder_path="data"):
-    """Load cached data for the specified basin and year if it exists."""
+def cache_exists(year, basin_name, folder_path="data"):
+    """Check if cached data exists for the specified basin and year in either format."""
+    return (os.path.exists(get_cache_path(year, basin_name, folder_path, "data.track")) or
+            os.path.exists(get_cache_path(year, basin_name, folder_path)))
 
-    basin_abbr = BASIN_ABBREVIATIONS.get(basin_name, "unknown")
-    if basin_abbr == "unknown":
-        print(f"Warning: No abbreviation found for basin '{basin_name}'. Using 'unknown'.")
-    
-    # Construct the cache file path
-    cache_file = os.path.join(folder_path, f"{basin_abbr}_{year}_data.json")
+
+def load_track_cache(year, basin_name, folder_path="data"):
+    """Memory-map the columnar cache for the specified basin and year, or return None if there is none."""
+    track_file = get_cache_path(year, basin_name, folder_path, "data.track")
+    if os.path.exists(track_file):
+        try:
+            return track_cache.load(track_file)
+        except (ValueError, OSError) as e:
+            print(f"Error loading cache file {track_file}: {e}")
+    return None
+
+
+def load_json_cache(year, basin_name, folder_path="data"):
+    """Load the JSON cache for the specified basin and year, or return None if there is none."""
+    cache_file = get_cache_path(year, basin_name, folder_path)
     
     if os.path.exists(cache_file):
         with open(cache_file, "r") as file:
@@ -168,9 +267,42 @@ def load_cache(year, basin_name, folder_path="data"):
     return None
 
 
-def save_data_as_json(year, basin_name, folder_path="data"):
+def load_cached_paths(year, basin_name, folder_path="data"):
+    """Load cached data for the specified basin and year as typhoon dicts with their full paths, as the scraper produces them."""
+    track_arrays = load_track_cache(year, basin_name, folder_path)
+    if track_arrays is not None:
+        print(f"Loaded data from cache: {get_cache_path(year, basin_name, folder_path, 'data.track')}")
+        return track_arrays.to_typhoons()
+    return load_json_cache(year, basin_name, folder_path)
+
+
+def load_cache(year, basin_name, folder_path="data"):
+    """
+    Load cached data for the specified basin and year if it exists.
+
+    Every typhoon comes with its Track. A columnar cache is returned as the storm fields plus the Track
+    built from its columns, without a path.
+    """
+
+    track_arrays = load_track_cache(year, basin_name, folder_path)
+    if track_arrays is not None:
+        print(f"Loaded data from cache: {get_cache_path(year, basin_name, folder_path, 'data.track')}")
+        return [dict(storm, track=track) for storm, track in zip(track_arrays.storms, track_arrays.to_tracks())]
+
+    return build_tracks(load_json_cache(year, basin_name, folder_path))
+
+
+def build_tracks(typhoons):
+    """Parse the path of every typhoon into its Track once, so the animation never has to. Returns the typhoons."""
+    for typhoon in typhoons or []:
+        typhoon["track"] = Track.from_path(typhoon["path"])
+    return typhoons
+
+
+def save_data_as_json(year, basin_name, folder_path="data", fetcher=None):
     """Save typhoon data from all links in a single JSON file."""
-    links_by_basin = scrape_typhoon_links(year)
+    fetcher = fetcher or get_fetcher()
+    links_by_basin = scrape_typhoon_links(year, fetcher, folder_path)
     if not links_by_basin:
         print("No data available for the specified year.")
         return None
@@ -190,100 +322,105 @@ def save_data_as_json(year, basin_name, folder_path="data"):
         print(f"No links available for basin '{basin_name}'.")
         return None
 
-    all_typhoon_data = []
-
-    for link in links_by_basin[basin_name]:
-        print(f"\nFetching typhoon name from {link}...")
-        typhoon_name = get_typhoon_name_from_link(link)
-        
-        if not typhoon_name:
-            print(f"Failed to extract typhoon name for {link}. Skipping.")
-            continue
-        
-        # Split the string into words
-        composite_name = typhoon_name.split()
+    links = links_by_basin[basin_name]
+    print(f"\nFetching {len(links)} typhoon pages...")
+    storms = fetcher.map(build_storm_from_page, [storm_url(link) for link in links])
+    all_typhoon_data = [typhoon_data for typhoon_data in storms if typhoon_data]
 
-        # Get the second-to-last word
-        if len(composite_name) >= 2:
-            typhoon_name = composite_name[-2]
-        else:
-            typhoon_name = "UNKNOWN"
+    save_cache(all_typhoon_data, year, basin_name, folder_path)
+    return all_typhoon_data
 
-        print(f"Fetching data from {link}...")
-        fourth_table_data = scrape_fourth_table(link)
-        
-        if not fourth_table_data:
-            print(f"Failed to extract data from the fourth table for {link}. Skipping.")
-            continue
-
-        processed_data = add_missing_dates_and_empty_cells(fourth_table_data)
-
-        typhoon_data = {
-            "name": typhoon_name,
-            "path": []
-        }
-
-        for row in processed_data:
-            time = row[1]
-            if time:
-                try:
-                    time_obj = datetime.strptime(time, "%Y-%m-%d %H:%M:%S")
-                    time = time_obj.strftime("%Y-%m-%d %H:%M")
-                except ValueError:
-                    pass
-
-            lat = row[3] if row[3] != "N / A" else None
-            long = row[4] if row[4] != "N / A" else None
-            speed = row[5] if row[5] != "N / A" else None
-            pressure = row[6] if row[6] != "N / A" else None
-
-            if speed:
-                speed = int(speed)
-                if speed < 34:
-                    typhoon_class = "0"
-                elif 34 <= speed <= 63:
-                    typhoon_class = "1"
-                elif 64 <= speed <= 82:
-                    typhoon_class = "2"
-                elif 83 <= speed <= 95:
-                    typhoon_class = "3"
-                elif 96 <= speed <= 112:
-                    typhoon_class = "4"
-                elif speed >= 113:
-                    typhoon_class = "5"
-            else:
-                typhoon_class = "0"
+def is_storm_active(typhoon_data):
+    """Check if a storm was still being tracked when it was last fetched, so its track may have grown since."""
+    if not typhoon_data["path"] or "fetched_at" not in typhoon_data:
+        return True
+    try:
+        last_time = parse_time(typhoon_data["path"][-1]["time"])
+    except (TypeError, ValueError):
+        return True
+    return typhoon_data["fetched_at"] - last_time < ACTIVE_STORM_WINDOW
+
+def merge_typhoon_data(cached, update):
+    """Append the track points of a freshly scraped storm that come after the cached track."""
+    merged = dict(cached)
+    last_time = cached["path"][-1]["time"] if cached["path"] else None
+    merged["path"] = cached["path"] + [
+        point for point in update["path"]
+        if last_time is None or (point["time"] and point["time"] > last_time)
+    ]
+    # Storms are often named only after they have been tracked for a while
+    merged["name"] = update["name"]
+    merged["fetched_at"] = update["fetched_at"]
+    return merged
+
+def refresh_typhoon_data(year, basin_name, cached_data, folder_path="data", fetcher=None):
+    """Bring cached data up to date by fetching only storms that are new or were still active."""
+    fetcher = fetcher or get_fetcher()
+    basin_name = basin_name.strip()
 
-            typhoon_data["path"].append({
-                "time": time,
-                "lat": float(lat) if lat else None,
-                "long": float(long) if long else None,
-                "speed": str(speed) if speed else "< 35",
-                "pressure": str(pressure) if pressure else "> 1008",
-                "class": int(typhoon_class)
-            })
+    if any("source" not in typhoon_data for typhoon_data in cached_data):
+        print(f"Cached data for {basin_name} in {year} has no source links. Scraping it again.")
+        return save_data_as_json(year, basin_name, folder_path, fetcher) or cached_data
+
+    links_by_basin = scrape_typhoon_links(year, fetcher, folder_path, max_age=0)
+    if not links_by_basin or basin_name not in links_by_basin:
+        print(f"Could not retrieve the storm list for {basin_name} in {year}. Using cached data.")
+        return cached_data
+
+    cached_by_source = {}
+    for typhoon_data in cached_data:
+        source = relative_link(typhoon_data["source"])
+        cached_by_source[source] = {**typhoon_data, "source": source}
+    links = links_by_basin[basin_name]
+    listed = set(links)
+    if not listed & cached_by_source.keys():
+        # Fetching every storm again and keeping the cached copies as unlisted would store each storm twice
+        print(f"None of the cached storms for {basin_name} in {year} are listed any more. Scraping it again.")
+        return save_data_as_json(year, basin_name, folder_path, fetcher) or cached_data
+
+    stale_links = [
+        link for link in links
+        if link not in cached_by_source or is_storm_active(cached_by_source[link])
+    ]
+    if not stale_links:
+        print(f"Cached data for {basin_name} in {year} is up to date.")
+        return cached_data
+
+    print(f"Refreshing {len(stale_links)} new or active storms...")
+    updates = dict(zip(stale_links, fetcher.map(build_storm_from_page, [storm_url(link) for link in stale_links])))
 
-        if processed_data:
-            try:
-                start_time = datetime.strptime(processed_data[0][1], "%Y-%m-%d %H:%M:%S")
-                start_time = start_time.replace(second=0)
-                typhoon_data["start_time"] = int(start_time.timestamp())
-            except ValueError:
-                typhoon_data["start_time"] = None
+    all_typhoon_data = []
+    for link in links:
+        cached = cached_by_source.get(link)
+        update = updates.get(link)
+        if cached and update:
+            all_typhoon_data.append(merge_typhoon_data(cached, update))
+        elif cached or update:
+            all_typhoon_data.append(cached or update)
 
-        all_typhoon_data.append(typhoon_data)
+    # Keep storms that are no longer listed rather than losing their data
+    all_typhoon_data.extend(typhoon_data for source, typhoon_data in cached_by_source.items() if source not in listed)
 
     save_cache(all_typhoon_data, year, basin_name, folder_path)
     return all_typhoon_data
 
-def scrape_typhoon_data(year, basin_name, folder_path="data"):
-    """Main function to either return existing data or scrape and return new data."""
-    data = load_cache(year, basin_name, folder_path)
+def scrape_typhoon_data(year, basin_name, folder_path="data", fetcher=None, refresh=None):
+    """
+    Main function to either return existing data or scrape and return new data, with the Track of every typhoon built.
+    Cached data is refreshed incrementally when refresh is True, which defaults to the current season only.
+    """
+    if refresh is None:
+        refresh = year >= datetime.now().year
+
+    # Refreshing merges new points into the cached paths, otherwise only the tracks are needed
+    data = (load_cached_paths if refresh else load_cache)(year, basin_name, folder_path)
     if data:
+        if refresh:
+            return build_tracks(refresh_typhoon_data(year, basin_name, data, folder_path, fetcher))
         return data
     else:
         print(f"Cache not found. Scraping data for {basin_name} in {year}.")
-        return save_data_as_json(year, basin_name, folder_path)
+        return build_tracks(save_data_as_json(year, basin_name, folder_path, fetcher))
 
 # Example usage:
 if __name__ == "__main__":